@@ -0,0 +1,202 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+WORDS = (
+    "data model signal sample protein market energy network policy climate orbit enzyme "
+    "lattice voltage genome archive ledger cluster theorem harvest reactor canopy sensor "
+    "spectrum glacier circuit neuron fossil catalyst current vector tensor habitat"
+).split()
+
+SCHEMA_FIELDS = [
+    {"key": "question", "type": "string", "description": "A question about the section"},
+    {"key": "answer", "type": "string", "description": "The answer to the question"},
+    {"key": "difficulty", "type": "number", "description": "Difficulty from 1 to 5"},
+]
+
+
+def _rng(*parts: Any) -> random.Random:
+    # Seeded from the request itself so the same prompt always gets the same answer.
+    return random.Random(zlib.crc32("\x1f".join(map(str, parts)).encode("utf-8")))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def write_fake_corpus(directory: str, documents: int = 200, words: int = 400, seed: int = 0) -> str:
+    """Fill ``directory`` with deterministic Markdown documents for the local search backend."""
+    os.makedirs(directory, exist_ok=True)
+    for i in range(documents):
+        rng = _rng(seed, "corpus", i)
+        paragraphs = [_words(rng, words // 4) + "." for _ in range(4)]
+        with open(os.path.join(directory, f"doc-{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# {_words(rng, 3)}\n\n" + "\n\n".join(paragraphs) + "\n")
+    return directory
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic, offline stand-in for the chat model used by the graph nodes.
+
+    It answers every structured-output tool (schema, sections, queries, reflection feedback)
+    and the dataset generation prompt with plausible, reproducible content. Reflection feedback
+    is never positive, so every section uses its whole ``num_reflections`` budget. Each call sleeps
+    ``latency_seconds`` (plus ``seconds_per_token`` per completion token) and fails transiently
+    with probability ``failure_rate``; like the provider SDKs, failed attempts are retried
+    internally up to ``max_retries`` times before the error is raised.
+    """
+
+    model_name: str = "fake-chat"
+    sections: int = 3
+    queries: int = 3
+    completion_tokens: int = 200
+    latency_seconds: float = 0.0
+    seconds_per_token: float = 0.0
+    failure_rate: float = 0.0
+    max_retries: int = 2
+    seed: int = 0
+    stats: Dict[str, int] = {}
+    stats_lock: Any = None
+    # Distinct reflection prompts answered; a retried or hedged request is counted once.
+    reflection_prompts: Any = None
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.stats = {"calls": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.stats_lock = threading.Lock()
+        self.reflection_prompts = set()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict]]) -> AIMessage:
+        text = "\n".join(str(message.content) for message in messages)
+        rng = _rng(self.seed, text)
+        if tools:
+            name = tools[0]["function"]["name"]
+            if name == "DatasetSchema":
+                args = {"generated_schema": SCHEMA_FIELDS}
+            elif name == "Sections":
+                args = {"sections": [
+                    {"section_name": f"Section {i + 1}: {_words(rng, 2)}", "sub_sections": [_words(rng, 4) for _ in range(3)]}
+                    for i in range(self.sections)
+                ]}
+            elif name == "Queries":
+                args = {"queries": [{"query": _words(rng, 6)} for _ in range(self.queries)]}
+            elif name == "Feedback":
+                with self.stats_lock:
+                    self.reflection_prompts.add(text)
+                args = {"feedback": f"Missing detail on {_words(rng, 3)}"}
+            else:
+                raise ValueError(f"FakeChatModel has no answer for tool {name}")
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{rng.getrandbits(32)}"}])
+
+        rows = re.search(r"Number of dataset rows must be (\d+)", text)
+        if rows:
+            content = json.dumps([
+                {"question": f"{_words(rng, 8)}?", "answer": _words(rng, 12), "difficulty": rng.randint(1, 5)}
+                for _ in range(int(rows.group(1)))
+            ])
+            return AIMessage(content=f"```json\n{content}\n```")
+        return AIMessage(content=_words(rng, self.completion_tokens))
+
+    def _call(self, messages: List[BaseMessage], tools: Optional[List[Dict]]) -> AIMessage:
+        rng = _rng(self.seed, "failures", *(message.content for message in messages))
+        for attempt in range(self.max_retries + 1):
+            with self.stats_lock:
+                self.stats["calls"] += 1
+            if rng.random() >= self.failure_rate:
+                break
+            with self.stats_lock:
+                self.stats["failures"] += 1
+            time.sleep(self.latency_seconds)
+            if attempt == self.max_retries:
+                raise ConnectionError("FakeChatModel: simulated provider failure")
+
+        message = self._respond(messages, tools)
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = max(1, (len(message.content) + len(json.dumps(message.tool_calls))) // 4)
+        time.sleep(self.latency_seconds + self.seconds_per_token * completion_tokens)
+        with self.stats_lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name}
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._call(messages, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"model_name": self.model_name})
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._call(messages, kwargs.get("tools"))
+        content = message.content
+        step = 256
+        for start in range(0, len(content), step):
+            last = start + step >= len(content)
+            chunk = AIMessageChunk(
+                content=content[start:start + step],
+                usage_metadata=message.usage_metadata if last else None,
+                response_metadata=message.response_metadata if last else {},
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeSearchClient:
+    """
+    A deterministic, offline stand-in for ``TavilyClient``.
+
+    Results are derived from the query, so repeated queries return identical content, and
+    each call sleeps ``latency_seconds`` and fails with probability ``failure_rate``.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, failure_rate: float = 0.0, content_tokens: int = 400, seed: int = 0):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.content_tokens = content_tokens
+        self.seed = seed
+        self.stats = {"calls": 0, "failures": 0}
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 5, timeout: int = 60, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.stats["calls"] += 1
+        time.sleep(self.latency_seconds)
+        rng = _rng(self.seed, query, max_results)
+        if rng.random() < self.failure_rate:
+            with self._lock:
+                self.stats["failures"] += 1
+            raise ConnectionError("FakeSearchClient: simulated search failure")
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://example.com/{rng.getrandbits(48):x}",
+                    "title": _words(rng, 5),
+                    "content": _words(rng, self.content_tokens),
+                    "score": round(1 - i / max(1, max_results), 3),
+                }
+                for i in range(max_results)
+            ],
+        }
@@ -0,0 +1,304 @@
+"""
+Offline benchmarks for the research graph.
+
+Runs ``agent_graph`` end to end with the chat model and search client in ``nodes.py`` swapped
+for the deterministic fakes in ``benchmarks.fakes``, so throughput can be compared between
+changes without network access or API spend:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --only baseline many_sections --output bench.json
+"""
+import argparse
+import json
+import os
+import sys
+import multiprocessing
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+# The graph opens its checkpointer at import time; keep it in memory.
+os.environ.setdefault("CHECKPOINT_PATH", ":memory:")
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from deep_research_workflow import nodes
+from deep_research_workflow.batch import LocalBatchBackend, register_batch_backend
+from deep_research_workflow.configuration import Configuration
+from deep_research_workflow.dedup import RowDeduplicator, filter_section_rows
+from deep_research_workflow.graph import agent_graph
+from deep_research_workflow.runs import interrupted_dataset_updates
+from deep_research_workflow.writers import open_dataset_writer, reopen_dataset_writer
+
+from .fakes import FakeChatModel, FakeSearchClient, write_fake_corpus
+
+console = Console()
+
+
+@dataclass
+class Scenario:
+    name: str
+    sections: int = 3
+    max_queries: int = 3
+    num_reflections: int = 1
+    max_rows_from_each_section: int = 5
+    search_depth: int = 2
+    llm_latency_seconds: float = 0.05
+    llm_failure_rate: float = 0.0
+    completion_tokens: int = 200
+    search_latency_seconds: float = 0.1
+    search_failure_rate: float = 0.0
+    crash_after_sections: int = 0
+    resume_after_failure: bool = False
+    config: Dict[str, Any] = field(default_factory=dict)
+
+
+SCENARIOS = [
+    Scenario("baseline"),
+    Scenario("many_sections", sections=10),
+    Scenario("deep_reflection", num_reflections=3),
+    Scenario("wide_search", max_queries=8, search_depth=5),
+    Scenario("large_rows", max_rows_from_each_section=50),
+    Scenario("huge_rows", max_rows_from_each_section=500),
+    Scenario("flaky", llm_failure_rate=0.1, search_failure_rate=0.1),
+    Scenario("batch_generation", config={"dataset_generation_mode": "batch", "batch_backend": "local"}),
+    Scenario("local_corpus", config={"search_backend": "local"}),
+    Scenario("multi_backend", config={"search_backend": "tavily,local"}),
+    Scenario("crash_resume", crash_after_sections=1),
+    Scenario(
+        "batch_failure",
+        resume_after_failure=True,
+        config={"dataset_generation_mode": "batch", "batch_backend": "failing_local"},
+    ),
+]
+
+
+class FailingFirstBatchBackend(LocalBatchBackend):
+    """The local batch backend, except that the first batch it is asked about has failed."""
+
+    name = "failing_local"
+    failed_batches: List[str] = []
+
+    def status(self, batch_id: str) -> str:
+        if not self.failed_batches:
+            self.failed_batches.append(batch_id)
+        if batch_id in self.failed_batches:
+            return "failed"
+        return super().status(batch_id)
+
+
+register_batch_backend("failing_local", lambda directory, complete: FailingFirstBatchBackend(directory, complete))
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _crash_and_resume(graph_input: Dict[str, Any], config: Dict[str, Any], directory: str, crash_after_sections: int) -> int:
+    """
+    Stop a run the way a crash would once ``crash_after_sections`` sections are written, resume it
+    into the same file the way ``main.py --resume`` does, and return the number of rows written.
+
+    Raises ``AssertionError`` if the resumed file lost or repeated rows or left partial files behind.
+    """
+    writer = open_dataset_writer(os.path.join(directory, "crash_resume"))
+    deduplicator = RowDeduplicator()
+    sections = 0
+    for event in agent_graph.stream(graph_input, config=config, stream_mode="updates"):
+        if "research_agent" in event:
+            writer.write_rows(filter_section_rows(event["research_agent"], deduplicator))
+            sections += 1
+            if sections == crash_after_sections:
+                break
+    # No close() or abort(): the file stays as a crash leaves it.
+    del writer
+
+    snapshot = agent_graph.get_state(config)
+    writer = reopen_dataset_writer(os.path.join(directory, "crash_resume.jsonl"), schema=snapshot.values.get("schema"))
+    deduplicator = RowDeduplicator()
+    deduplicator.seed(writer.resumed_rows)
+    for update in interrupted_dataset_updates(snapshot):
+        writer.write_rows(filter_section_rows(update, deduplicator))
+    for event in agent_graph.stream(None, config=config, stream_mode="updates"):
+        if "research_agent" in event:
+            writer.write_rows(filter_section_rows(event["research_agent"], deduplicator))
+    path = writer.close()
+
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [line for line in f if line.strip()]
+    assert len(set(rows)) == len(rows), f"{len(rows) - len(set(rows))} rows written twice after resuming"
+    leftovers = sorted(name for name in os.listdir(directory) if name != os.path.basename(path))
+    assert not leftovers, f"resuming left {', '.join(leftovers)} behind"
+    return len(rows)
+
+
+def run_scenario(scenario: Scenario, cache_dir: str, seed: int = 0) -> Dict[str, Any]:
+    """
+    Run one scenario end to end against fresh fakes and return its measurements.
+
+    Peak memory is the process's peak resident set size, so call this in a fresh process
+    (as ``main`` does) to get a figure for the scenario alone.
+    """
+    llm = FakeChatModel(
+        sections=scenario.sections,
+        queries=scenario.max_queries,
+        completion_tokens=scenario.completion_tokens,
+        latency_seconds=scenario.llm_latency_seconds,
+        failure_rate=scenario.llm_failure_rate,
+        seed=seed,
+    )
+    search = FakeSearchClient(
+        latency_seconds=scenario.search_latency_seconds,
+        failure_rate=scenario.search_failure_rate,
+        seed=seed,
+    )
+    nodes.llm, nodes.tavily_client = llm, search
+
+    # Caches and rate limits would make later scenarios measure the disk or the limiter,
+    # not the pipeline, so both are off unless a scenario opts back in through ``config``.
+    configurable = {
+        **asdict(Configuration.from_runnable_config({})),
+        "thread_id": str(uuid.uuid4()),
+        "auto_approve": True,
+        "cache_dir": cache_dir,
+        "search_cache_enabled": False,
+        "llm_cache_enabled": False,
+        "llm_requests_per_minute": 0,
+        "llm_tokens_per_minute": 0,
+        "search_requests_per_minute": 0,
+        "max_queries": scenario.max_queries,
+        "num_reflections": scenario.num_reflections,
+        "max_rows_from_each_section": scenario.max_rows_from_each_section,
+        "search_depth": scenario.search_depth,
+        **scenario.config,
+    }
+    if "local" in configurable["search_backend"].split(",") and not configurable["local_corpus_dir"]:
+        configurable["local_corpus_dir"] = write_fake_corpus(os.path.join(cache_dir, "corpus"), seed=seed)
+    graph_input = {"topic": f"Benchmark {scenario.name}", "outline": "Question and answer pairs"}
+
+    config = {"configurable": configurable, "recursion_limit": 200}
+
+    started = time.perf_counter()
+    error = None
+    rows = 0
+    try:
+        if scenario.crash_after_sections:
+            with tempfile.TemporaryDirectory() as directory:
+                rows = _crash_and_resume(graph_input, config, directory, scenario.crash_after_sections)
+            # Every section's rows are distinct, so none may be missing from the resumed file.
+            expected_rows = scenario.sections * scenario.max_rows_from_each_section
+            if rows != expected_rows:
+                error = f"expected {expected_rows} rows after resuming, got {rows}"
+        elif scenario.resume_after_failure:
+            try:
+                agent_graph.invoke(graph_input, config=config)
+                error = "expected the first attempt to fail"
+            except Exception:
+                # The resumed run has to recover from the failure, not run into it again.
+                state = agent_graph.invoke(None, config=config)
+                rows = sum(stats["rows"] for stats in state.get("section_stats", []))
+        else:
+            state = agent_graph.invoke(graph_input, config=config)
+            rows = sum(stats["rows"] for stats in state.get("section_stats", []))
+    except Exception as e:
+        error = str(e)
+    seconds = time.perf_counter() - started
+
+    # The fake never approves a section, so each one must go through the first reflection
+    # plus one more per ``num_reflections``; anything else means the loop exits too early
+    # or never stops on its budget.
+    expected = scenario.sections * (int(configurable["num_reflections"]) + 1)
+    if not error and len(llm.reflection_prompts) != expected:
+        error = f"expected {expected} reflection passes, got {len(llm.reflection_prompts)}"
+
+    calls = llm.stats["calls"] + search.stats["calls"]
+    return {
+        "scenario": scenario.name,
+        "status": "failed" if error else "completed",
+        "error": error,
+        "seconds": round(seconds, 3),
+        "llm_calls": llm.stats["calls"],
+        "search_calls": search.stats["calls"],
+        "failures": llm.stats["failures"] + search.stats["failures"],
+        "calls_per_second": round(calls / seconds, 2) if seconds else 0.0,
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 2) if seconds else 0.0,
+        "prompt_tokens": llm.stats["prompt_tokens"],
+        "completion_tokens": llm.stats["completion_tokens"],
+        "peak_memory_mb": round(_peak_rss_bytes() / 2 ** 20, 2),
+        "params": asdict(scenario),
+    }
+
+
+def render_results(results: List[Dict[str, Any]]):
+    table = Table(title="Benchmark Results", box=box.ASCII, header_style="bold magenta", show_lines=False)
+    for column in ("Scenario", "Wall (s)", "LLM", "Search", "Calls/s", "Rows", "Rows/s", "Tokens", "Peak MB"):
+        table.add_column(column, justify="left" if column == "Scenario" else "right", no_wrap=True)
+    for result in results:
+        name = result["scenario"] if result["status"] == "completed" else f"[red]{result['scenario']} (failed)[/red]"
+        table.add_row(
+            name,
+            f"{result['seconds']:.2f}",
+            str(result["llm_calls"]),
+            str(result["search_calls"]),
+            f"{result['calls_per_second']:.1f}",
+            str(result["rows"]),
+            f"{result['rows_per_second']:.1f}",
+            str(result["prompt_tokens"] + result["completion_tokens"]),
+            f"{result['peak_memory_mb']:.1f}",
+        )
+    console.print(table)
+    for result in results:
+        if result["error"]:
+            console.print(f"[red]{result['scenario']}:[/red] {result['error']}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    names = [scenario.name for scenario in SCENARIOS]
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake LLM and search backends")
+    parser.add_argument("--only", nargs="+", choices=names, metavar="SCENARIO", help=f"scenarios to run (default: all of {', '.join(names)})")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the fake backends (default: 0)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every simulated latency by this factor (default: 1.0)")
+    parser.add_argument("--output", metavar="JSON", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or scenario.name in args.only]
+    results = []
+    # Each scenario runs in a fresh process so process-wide state (rate limiters, registries,
+    # peak memory) does not carry over from the previous one.
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for scenario in scenarios:
+            scenario = replace(
+                scenario,
+                llm_latency_seconds=scenario.llm_latency_seconds * args.latency_scale,
+                search_latency_seconds=scenario.search_latency_seconds * args.latency_scale,
+            )
+            console.print(f"[dim]Running {scenario.name}...[/dim]")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(run_scenario, scenario, cache_dir, args.seed).result())
+    render_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "latency_scale": args.latency_scale, "results": results}, f, indent=2)
+        console.print(f"[green]Saved results to:[/green] {args.output}")
+    return 0 if all(result["status"] == "completed" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
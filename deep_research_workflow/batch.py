@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# A batch request is a JSON-serializable dict:
+#   {"custom_id": str, "provider": str, "model": str, "temperature": float,
+#    "messages": [{"role": ..., "content": ...}, ...]}
+# and a batch result maps each custom_id to
+#   {"content": str, "prompt_tokens": int, "completion_tokens": int} or {"error": str}.
+
+
+class BatchBackend(ABC):
+    """
+    Submits many chat completions as one deferred job and hands the results back later.
+
+    Backends trade latency for price and throughput: ``submit`` returns straight away with a
+    batch id, ``status`` is polled until it is no longer ``"pending"`` and ``results`` maps
+    each request's ``custom_id`` to its completion.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        ...
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return ``"pending"``, ``"completed"`` or ``"failed"``."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        ...
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The OpenAI Batch API: half the price of synchronous calls, completed within 24 hours."""
+
+    name = "openai"
+    FINISHED = {"completed": "completed", "failed": "failed", "expired": "failed", "cancelled": "failed"}
+
+    def __init__(self, client=None, completion_window: str = "24h"):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        providers = {request["provider"] for request in requests}
+        if providers != {"openai"}:
+            raise ValueError(f"The openai batch backend only runs OpenAI models, got {sorted(providers)}")
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": request["model"], "temperature": request["temperature"], "messages": request["messages"]},
+            }, ensure_ascii=False)
+            for request in requests
+        ]
+        batch_file = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.FINISHED.get(self.client.batches.retrieve(batch_id).status, "pending")
+
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code", 200) != 200:
+                    results[record["custom_id"]] = {"error": json.dumps(record.get("error") or body.get("error"))}
+                    continue
+                usage = body.get("usage") or {}
+                results[record["custom_id"]] = {
+                    "content": body["choices"][0]["message"]["content"] or "",
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                }
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    A file-based stand-in for a provider batch API, for tests and offline runs.
+
+    ``submit`` writes the requests to ``<directory>/<batch_id>/input.jsonl``; the first
+    ``status`` call after that runs them through ``complete`` and writes ``output.jsonl``,
+    so the polling and result mapping paths are the same as with a real backend.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str, complete: Callable[[Dict[str, Any]], Dict[str, Any]], max_workers: int = 4):
+        self.directory = directory
+        self.complete = complete
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.directory, batch_id, name)
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, batch_id), exist_ok=True)
+        with open(self._path(batch_id, "input.jsonl"), "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return batch_id
+
+    def _run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return {"custom_id": request["custom_id"], **self.complete(request)}
+        except Exception as e:
+            return {"custom_id": request["custom_id"], "error": str(e)}
+
+    def status(self, batch_id: str) -> str:
+        if not os.path.exists(self._path(batch_id, "input.jsonl")):
+            return "failed"
+        with self._lock:
+            output_path = self._path(batch_id, "output.jsonl")
+            if not os.path.exists(output_path):
+                with open(self._path(batch_id, "input.jsonl"), encoding="utf-8") as f:
+                    requests = [json.loads(line) for line in f if line.strip()]
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    outputs = list(executor.map(self._run, requests))
+                with open(f"{output_path}.part", "w", encoding="utf-8") as f:
+                    for output in outputs:
+                        f.write(json.dumps(output, ensure_ascii=False) + "\n")
+                os.replace(f"{output_path}.part", output_path)
+        return "completed"
+
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        with open(self._path(batch_id, "output.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    results[record.pop("custom_id")] = record
+        return results
+
+
+# Factories take the batch working directory and a ``complete(request)`` callable that runs
+# one request synchronously (only the local backend needs it).
+BATCH_BACKENDS: Dict[str, Callable[[str, Callable], BatchBackend]] = {
+    "openai": lambda directory, complete: OpenAIBatchBackend(),
+    "local": lambda directory, complete: LocalBatchBackend(directory, complete),
+}
+
+
+def register_batch_backend(name: str, factory: Callable[[str, Callable], BatchBackend]) -> None:
+    BATCH_BACKENDS[name] = factory
+
+
+def get_batch_backend(name: str, directory: str, complete: Callable[[Dict[str, Any]], Dict[str, Any]]) -> BatchBackend:
+    if name not in BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch backend {name!r}. Expected one of: {', '.join(BATCH_BACKENDS)}.")
+    return BATCH_BACKENDS[name](directory, complete)
+
+
+def load_batch_id(path: str, backend: str) -> Optional[str]:
+    """Return the batch already submitted for a run, so a resumed run polls it instead of resubmitting."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        return None
+    return record["batch_id"] if record.get("backend") == backend else None
+
+
+def save_batch_id(path: str, backend: str, batch_id: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.part", "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "batch_id": batch_id}, f)
+    os.replace(f"{path}.part", path)
+
+
+def clear_batch_id(path: str) -> None:
+    """Forget a run's batch, e.g. one that failed, so a resumed run submits a new one."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+
+class SQLiteCache:
+    """
+    A small key/value store on top of SQLite with TTL expiry and LRU eviction.
+
+    Values are stored as text. Every lookup refreshes the entry's access time, and once the
+    table grows past ``max_entries`` the least recently used entries are evicted. The store is
+    safe to share between the threads LangGraph runs parallel branches on.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 10000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {"path": self.path, "entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SearchCache(SQLiteCache):
+    """Caches search results keyed on the normalized query and every search parameter."""
+
+    @staticmethod
+    def make_key(query: str, **params: Any) -> str:
+        payload = json.dumps({"query": normalize_query(query), **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_results(self, query: str, **params: Any) -> Optional[List[Any]]:
+        value = self.get(self.make_key(query, **params))
+        return json.loads(value) if value is not None else None
+
+    def set_results(self, query: str, results: List[Any], **params: Any) -> None:
+        self.set(self.make_key(query, **params), json.dumps(results, ensure_ascii=False))
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Exact-match chat model response cache persisted in SQLite.
+
+    LangChain calls ``lookup``/``update`` with the rendered messages as ``prompt`` and an
+    ``llm_string`` describing the model class (and thus the provider), model name, temperature
+    and every bound invocation kwarg such as tools, ``tool_choice`` or a structured-output
+    schema, so all of them take part in the key.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 10000):
+        self.store = SQLiteCache(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._local = threading.local()
+
+    def last_lookup_hit(self) -> bool:
+        """Whether the most recent lookup on the calling thread was served from the cache."""
+        return getattr(self._local, "hit", False)
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        self._local.hit = False
+        value = self.store.get(self.make_key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            generations = loads(value, allowed_objects="core")
+        except Exception as e:
+            print(f"[LLM Cache] Ignoring unreadable entry: {e}")
+            return None
+        self._local.hit = True
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.store.set(self.make_key(prompt, llm_string), dumps(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+C = TypeVar("C")
+
+_caches: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(cls: Type[C], path: str, ttl_seconds: Optional[float], max_entries: int) -> C:
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = cls(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+        return cache
+
+
+def get_search_cache(path: str, ttl_seconds: Optional[float], max_entries: int) -> SearchCache:
+    """Return the process-wide ``SearchCache`` for ``path``, creating it on first use."""
+    return _get_cache(SearchCache, path, ttl_seconds, max_entries)
+
+
+def get_llm_cache(path: str, ttl_seconds: Optional[float], max_entries: int) -> LLMResponseCache:
+    """Return the process-wide ``LLMResponseCache`` for ``path``, creating it on first use."""
+    return _get_cache(LLMResponseCache, path, ttl_seconds, max_entries)
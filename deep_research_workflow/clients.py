@@ -0,0 +1,36 @@
+import threading
+from typing import Any, Dict, Tuple
+
+from .utils import init_llm
+
+
+_chat_models: Dict[Tuple[str, str], Any] = {}
+_search_client = None
+_clients_lock = threading.Lock()
+
+
+def get_chat_model(provider: str, model: str):
+    """
+    Return the process-wide chat model for ``provider``/``model``, creating it on first use.
+
+    There is one client per distinct model, shared by every node and section that uses it;
+    callers that need another temperature take a ``model_copy``, which keeps the same
+    underlying HTTP client. Nothing is imported or validated until a node actually needs the
+    model, so a missing API key only matters for the providers a run is configured to use.
+    """
+    key = (provider, model)
+    with _clients_lock:
+        chat_model = _chat_models.get(key)
+        if chat_model is None:
+            chat_model = _chat_models[key] = init_llm(provider=provider, model=model)
+        return chat_model
+
+
+def get_search_client():
+    """Return the process-wide Tavily client, creating it on first use."""
+    global _search_client
+    with _clients_lock:
+        if _search_client is None:
+            from tavily import TavilyClient
+            _search_client = TavilyClient()
+        return _search_client
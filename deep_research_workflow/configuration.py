@@ -4,17 +4,75 @@ import os
 from typing import Any
 import uuid
 
+
+def _coerce(value: Any, default: Any) -> Any:
+    # Environment variables always arrive as strings; convert them to the field's type.
+    if not isinstance(value, str) or default is None or isinstance(default, str):
+        return value
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+
 @dataclass(kw_only=True)
 class Configuration:
-    thread_id: str = str(uuid.uuid4()),
+    thread_id: str = str(uuid.uuid4())
     provider: str = "openai"
     model: str = "gpt-4o-mini"
     temperature: float = 0.5
+    node_models: str = ""
+    fallback_models: str = ""
+    hedge_after_seconds: float = 0.0
     max_queries: int = 3
     search_depth: int = 2
+    search_concurrency: int = 4
+    search_timeout_seconds: int = 30
+    search_retries: int = 1
+    search_backend: str = "tavily"
+    local_corpus_dir: str = ""
+    local_corpus_index_path: str = ""
+    search_backend_deadline_seconds: float = 5.0
+    search_fusion_k: int = 60
+    cache_dir: str = ".cache"
+    query_registry_enabled: bool = True
+    query_similarity_threshold: float = 0.8
+    dedup_search_content: bool = True
+    dedup_across_sections: bool = False
+    dedup_max_distance: int = 6
+    search_cache_enabled: bool = True
+    search_cache_bypass: bool = False
+    search_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    search_cache_max_entries: int = 50000
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 0
+    llm_cache_max_entries: int = 20000
+    llm_cache_disabled_nodes: str = ""
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200000
+    provider_rate_limits: str = ""
+    search_requests_per_minute: int = 100
     num_reflections: int = 2
-    section_delay_seconds: int = 15
+    accumulator_token_budget: int = 8000
+    accumulated_content_max_tokens: int = 4000
+    retrieval_enabled: bool = True
+    retrieval_top_k: int = 12
+    retrieval_chunk_tokens: int = 200
     max_rows_from_each_section: int = 5
+    generation_chunk_rows: int = 25
+    generation_concurrency: int = 4
+    dataset_generation_mode: str = "sync"
+    batch_backend: str = "openai"
+    batch_poll_seconds: int = 60
+    batch_timeout_seconds: int = 24 * 60 * 60
+    auto_approve: bool = False
+    dedup_rows: bool = True
+    dedup_rows_near: bool = False
+    output_format: str = "jsonl"
+    output_compression: str = ""
     
     @classmethod
     def from_runnable_config(
@@ -26,10 +84,88 @@ class Configuration:
             config["configurable"] if config and "configurable" in config else {}
         )
 
+        # Values passed in ``configurable`` (a job's config, a resumed run's saved settings)
+        # win over environment variables, which win over the defaults.
         values: dict[str, Any] = {
-            f.name: os.environ.get(f.name.upper(), configurable.get(f.name, f.default))
+            f.name: _coerce(
+                configurable[f.name] if f.name in configurable else os.environ.get(f.name.upper(), f.default),
+                f.default,
+            )
             for f in fields(cls)
             if f.init
         }
 
-        return cls(**values)
\ No newline at end of file
+        return cls(**values)
+
+    def llm_cache_enabled_for(self, node: str) -> bool:
+        disabled = self.llm_cache_disabled_nodes
+        if isinstance(disabled, str):
+            disabled = disabled.split(",")
+        return self.llm_cache_enabled and node not in {name.strip() for name in disabled}
+
+    def model_for(self, node: str) -> tuple[str, str, float]:
+        """Return ``(provider, model, temperature)`` for ``node``.
+
+        ``node_models`` overrides the run's model per node, formatted as
+        ``"query_generator=openai:gpt-4.1-nano:0.2,final_section_dataset_generator=openai:gpt-4o"``
+        (or as a dict of the same strings); the temperature is optional.
+        """
+        entries = self.node_models
+        if isinstance(entries, str):
+            entries = dict(entry.partition("=")[::2] for entry in entries.split(",") if "=" in entry)
+        spec = {name.strip(): value for name, value in entries.items()}.get(node)
+        if not spec:
+            return self.provider, self.model, float(self.temperature)
+        return self._parse_model(spec)
+
+    def search_backend_names(self) -> list[str]:
+        """Return the backends each query is sent to.
+
+        ``search_backend`` names one backend, or several separated by commas (or a list),
+        e.g. ``"tavily,local"``; their results are merged with reciprocal rank fusion.
+        """
+        names = self.search_backend
+        if isinstance(names, str):
+            names = names.split(",")
+        return list(dict.fromkeys(name.strip() for name in names if name.strip())) or ["tavily"]
+
+    def fallback_chain(self) -> list[tuple[str, str, float]]:
+        """Return ``(provider, model, temperature)`` for each entry of ``fallback_models``.
+
+        ``fallback_models`` lists the models to fail over to, in order, formatted as
+        ``"anthropic:claude-3-5-haiku-latest,google:gemini-2.0-flash:0.3"``.
+        """
+        entries = self.fallback_models
+        if isinstance(entries, str):
+            entries = entries.split(",")
+        return [self._parse_model(entry) for entry in entries if entry.strip()]
+
+    def _parse_model(self, spec: str) -> tuple[str, str, float]:
+        provider, _, model = spec.strip().partition(":")
+        temperature = float(self.temperature)
+        head, _, tail = model.rpartition(":")
+        if head:
+            try:
+                model, temperature = head, float(tail)
+            except ValueError:
+                pass  # part of the model name, e.g. an Ollama tag such as "llama3:8b"
+        return provider.strip(), model.strip() or self.model, temperature
+
+    def rate_limits_for(self, provider: str) -> tuple[int, int]:
+        """Return ``(requests_per_minute, tokens_per_minute)`` for ``provider``.
+
+        ``provider_rate_limits`` overrides the defaults per provider, formatted as
+        ``"openai=500:200000,anthropic=50:40000"`` (or as a dict of the same ``"rpm:tpm"``
+        strings or of ``[rpm, tpm]`` pairs); 0 disables a limit.
+        """
+        entries = self.provider_rate_limits
+        if isinstance(entries, str):
+            entries = dict(entry.partition("=")[::2] for entry in entries.split(",") if "=" in entry)
+        limits = {name.strip(): value for name, value in entries.items()}.get(provider)
+        if not limits:
+            return int(self.llm_requests_per_minute), int(self.llm_tokens_per_minute)
+        if isinstance(limits, str):
+            rpm, _, tpm = limits.partition(":")
+        else:
+            rpm, tpm = limits
+        return int(rpm or 0), int(tpm or 0)
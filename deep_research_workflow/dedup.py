@@ -0,0 +1,221 @@
+import hashlib
+import json
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .utils import count_tokens
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str, size: int = 4) -> Set[str]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def simhash(text: str, size: int = 4) -> int:
+    """64-bit SimHash over word shingles; near-duplicate texts differ in only a few bits."""
+    weights = [0] * 64
+    for shingle in shingles(text, size):
+        value = _hash64(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class SimHashIndex:
+    """
+    Finds near-duplicates among SimHash fingerprints without comparing against every entry.
+
+    Fingerprints are split into ``max_distance + 1`` bands. Two fingerprints within
+    ``max_distance`` bits of each other must agree exactly on at least one band, so only the
+    entries sharing a band with the query are compared.
+    """
+
+    def __init__(self, max_distance: int = 6):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._band_bits = 64 // self.bands
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self._band_bits) - 1
+        return [(band, fingerprint >> (band * self._band_bits) & mask) for band in range(self.bands)]
+
+    def add_if_new(self, fingerprint: int) -> bool:
+        """Add ``fingerprint`` and return True, or return False if a near-duplicate is indexed."""
+        keys = self._band_keys(fingerprint)
+        with self._lock:
+            for key in keys:
+                for other in self._buckets.get(key, ()):
+                    if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                        return False
+            for key in keys:
+                self._buckets.setdefault(key, []).append(fingerprint)
+            return True
+
+
+class ContentDeduplicator:
+    """Drops search result content that duplicates or nearly duplicates content seen before."""
+
+    def __init__(self, max_distance: int = 6):
+        self.index = SimHashIndex(max_distance)
+        self.dropped = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def seed(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            self.index.add_if_new(simhash(text))
+
+    def filter(self, texts: Iterable[str]) -> List[str]:
+        kept = []
+        for text in texts:
+            if not normalize_text(text) or self.index.add_if_new(simhash(text)):
+                kept.append(text)
+                continue
+            with self._lock:
+                self.dropped += 1
+                self.tokens_saved += count_tokens(text)
+        return kept
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, list):
+        return [_normalize_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize_value(item) for key, item in value.items()}
+    if isinstance(value, float) and value.is_integer():
+        # Typed formats read whole numbers back as floats; 3.0 and 3 are the same value.
+        return int(value)
+    return value
+
+
+class RowDeduplicator:
+    """
+    Removes duplicate dataset rows across sections with memory that stays small per row.
+
+    Exact duplicates are detected on a 16-byte digest of the row's normalized field values
+    (case, punctuation and whitespace are ignored). The optional near-duplicate pass computes
+    a MinHash signature over the row's text and indexes it with locality-sensitive hashing:
+    a row whose signature matches a previous row on any band is treated as a duplicate.
+    Only digests and band hashes are kept, never the rows themselves, so hundreds of
+    thousands of rows fit comfortably in memory.
+    """
+
+    def __init__(self, near_duplicates: bool = False, num_perm: int = 16, bands: int = 4, seed: int = 0):
+        self.near_duplicates = near_duplicates
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(self.rows_per_band * bands)]
+        self._exact: Set[bytes] = set()
+        self._near: Set[int] = set()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _exact_key(row: Dict[str, Any]) -> bytes:
+        payload = json.dumps(_normalize_value(row), sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def _band_keys(self, row: Dict[str, Any]) -> List[int]:
+        text = " ".join(str(value) for value in row.values() if isinstance(value, (str, list)))
+        # The index only lives for one process, so the fast built-in string hash is enough here.
+        hashes = [hash(shingle) & 0xFFFFFFFFFFFFFFFF for shingle in shingles(text, size=3)]
+        if not hashes:
+            return []
+        signature = [min(map(mask.__xor__, hashes)) for mask in self._masks]
+        return [
+            hash((band, *signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]))
+            for band in range(self.bands)
+        ]
+
+    def seed(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Mark ``rows`` as seen without counting them, e.g. the rows a resumed run already wrote."""
+        with self._lock:
+            for row in rows:
+                self._exact.add(self._exact_key(row))
+                if self.near_duplicates:
+                    self._near.update(self._band_keys(row))
+
+    def filter(self, rows: Iterable[Dict[str, Any]], section: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the rows not seen before, recording per-section counts under ``section``."""
+        kept = []
+        with self._lock:
+            stats = self.stats.setdefault(section or "", {"rows": 0, "kept": 0, "exact_duplicates": 0, "near_duplicates": 0})
+            for row in rows:
+                stats["rows"] += 1
+                key = self._exact_key(row)
+                if key in self._exact:
+                    stats["exact_duplicates"] += 1
+                    continue
+                self._exact.add(key)
+
+                if self.near_duplicates:
+                    band_keys = self._band_keys(row)
+                    if any(band_key in self._near for band_key in band_keys):
+                        stats["near_duplicates"] += 1
+                        continue
+                    self._near.update(band_keys)
+
+                stats["kept"] += 1
+                kept.append(row)
+        return kept
+
+    def report(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"section_name": section, **counts} for section, counts in self.stats.items()]
+
+
+def filter_section_rows(section_output: Dict[str, Any], deduplicator: Optional[RowDeduplicator]) -> List[Dict[str, Any]]:
+    """
+    Return the rows of a ``research_agent`` (or batch) update, minus rows seen in earlier sections.
+
+    ``section_stats`` tells which span of rows came from which section; a batch update carries
+    several sections at once.
+    """
+    rows = section_output.get("final_section_dataset", [])
+    if deduplicator is None:
+        return rows
+    kept = []
+    offset = 0
+    for stats in section_output.get("section_stats") or [{"rows": len(rows)}]:
+        count = stats.get("rows", len(rows) - offset)
+        kept.extend(deduplicator.filter(rows[offset:offset + count], stats.get("section_name")))
+        offset += count
+    kept.extend(deduplicator.filter(rows[offset:]))
+    return kept
+
+
+_run_deduplicators: "OrderedDict[str, ContentDeduplicator]" = OrderedDict()
+_run_deduplicators_lock = threading.Lock()
+_MAX_TRACKED_RUNS = 32
+
+
+def get_run_deduplicator(thread_id: str, max_distance: int = 6) -> ContentDeduplicator:
+    """Return the deduplicator shared by every section of the run ``thread_id``."""
+    with _run_deduplicators_lock:
+        deduplicator = _run_deduplicators.get(thread_id)
+        if deduplicator is None:
+            deduplicator = _run_deduplicators[thread_id] = ContentDeduplicator(max_distance)
+            while len(_run_deduplicators) > _MAX_TRACKED_RUNS:
+                _run_deduplicators.popitem(last=False)
+        _run_deduplicators.move_to_end(thread_id)
+        return deduplicator
@@ -0,0 +1,236 @@
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+
+# SDK packages whose exceptions count as provider errors worth retrying elsewhere.
+PROVIDER_ERROR_MODULES = {"openai", "anthropic", "google", "ollama", "httpx", "httpcore"}
+
+# A provider that fails this many times in a row is tried last until the cooldown passes.
+MAX_CONSECUTIVE_FAILURES = 3
+COOLDOWN_SECONDS = 60.0
+
+
+def provider_error_kind(error: BaseException) -> Optional[str]:
+    """Classify ``error`` as ``"rate_limit"``, ``"provider"`` or None without importing any provider SDK."""
+    for cls in type(error).__mro__:
+        if cls.__name__ in ("RateLimitError", "ResourceExhausted"):
+            return "rate_limit"
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return "provider"
+    if any(cls.__module__.split(".")[0] in PROVIDER_ERROR_MODULES for cls in type(error).__mro__):
+        return "provider"
+    return None
+
+
+class ProviderHealth:
+    """
+    Success, failure and latency counters for one provider/model, shared across runs.
+
+    ``available`` turns False after ``MAX_CONSECUTIVE_FAILURES`` failures in a row and stays
+    so for ``COOLDOWN_SECONDS``, which moves the model to the back of every failover chain.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.hedges = 0
+        self.wins = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = 0.0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def record_success(self, seconds: float, won: bool = True) -> None:
+        with self._lock:
+            self.wins += int(won)
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            self.latency_ewma = seconds if not self.latency_ewma else 0.8 * self.latency_ewma + 0.2 * seconds
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                self.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def record_hedge(self) -> None:
+        with self._lock:
+            self.hedges += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "wins": self.wins,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "latency_seconds": round(self.latency_ewma, 3),
+            "available": self.available(),
+        }
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_provider_health(name: str) -> ProviderHealth:
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = ProviderHealth(name)
+        return health
+
+
+def provider_health_stats() -> list:
+    with _health_lock:
+        return [health.stats() for health in _health.values()]
+
+
+class FailoverChatModel(BaseChatModel):
+    """
+    A chat model that races an ordered chain of candidate models.
+
+    The first healthy candidate is called on its own. If it has not produced anything after
+    ``hedge_after_seconds`` (0 disables hedging) a duplicate request goes to the next one, and
+    if it fails with a retryable provider error the next one is called straight away. The
+    first candidate to produce output wins; streams from the losers are closed, and their
+    late results are discarded. Streaming hedges on time to first chunk, so a winner that
+    fails mid-stream raises rather than switching providers halfway through an answer.
+    """
+
+    candidates: List[Any]
+    names: List[str]
+    hedge_after_seconds: float = 0.0
+    # Called with the name of a model that failed with a retryable error before the next one is tried.
+    on_retry: Optional[Callable[[str], None]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "failover"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"candidates": self.names, "hedge_after_seconds": self.hedge_after_seconds}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FailoverChatModel":
+        # Every provider formats tools its own way, so bind them on each candidate.
+        return self.model_copy(update={
+            "candidates": [candidate.bind_tools(tools, **kwargs) for candidate in self.candidates],
+        })
+
+    def _ordered(self) -> List[int]:
+        # Keep the configured order, but try models that are cooling down last.
+        return sorted(range(len(self.candidates)), key=lambda i: not get_provider_health(self.names[i]).available())
+
+    def stream_with(self, make_iter: Callable[[Runnable], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Race ``make_iter(candidate)`` across the chain and yield the items of the winner.
+
+        The winner is the first candidate to yield an item, so callers decide what is sent
+        (a completion, a stream of text chunks) while the chain decides where it goes.
+        """
+        order = self._ordered()
+        events: "queue.Queue" = queue.Queue()
+        cancelled: Dict[int, threading.Event] = {}
+        started: Dict[int, float] = {}
+        errors: List[BaseException] = []
+        next_slot = 0
+        active = 0
+        winner = None
+
+        def pump(index: int) -> None:
+            try:
+                for item in make_iter(self.candidates[index]):
+                    if cancelled[index].is_set():
+                        return
+                    events.put((index, "item", item))
+                events.put((index, "end", None))
+            except BaseException as e:
+                events.put((index, "error", e))
+
+        def launch() -> None:
+            nonlocal next_slot, active
+            index = order[next_slot]
+            next_slot += 1
+            active += 1
+            cancelled[index] = threading.Event()
+            started[index] = time.perf_counter()
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(pump, index), daemon=True).start()
+
+        launch()
+        deadline = time.monotonic() + self.hedge_after_seconds
+        while active:
+            timeout = None
+            if winner is None and self.hedge_after_seconds > 0 and next_slot < len(order):
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                index, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                slow = self.names[order[next_slot - 1]]
+                get_provider_health(slow).record_hedge()
+                print(f"[Hedge] {slow} has not answered in {self.hedge_after_seconds}s, also asking {self.names[order[next_slot]]}")
+                launch()
+                deadline = time.monotonic() + self.hedge_after_seconds
+                continue
+
+            health = get_provider_health(self.names[index])
+            if winner is not None and index != winner:
+                if kind != "item":
+                    active -= 1
+                continue
+
+            if kind == "item":
+                if winner is None:
+                    winner = index
+                    health.record_success(time.perf_counter() - started[index])
+                    for other, flag in cancelled.items():
+                        if other != index:
+                            flag.set()
+                yield payload
+            elif kind == "end":
+                active -= 1
+                if winner is None:
+                    # Finished without output: nothing to hedge against, so it still wins.
+                    health.record_success(time.perf_counter() - started[index])
+                    winner = index
+                if index == winner:
+                    return
+            else:
+                active -= 1
+                if index == winner:
+                    health.record_failure()
+                    raise payload
+                health.record_failure()
+                errors.append(payload)
+                if provider_error_kind(payload) is None:
+                    if not active:
+                        raise payload
+                elif next_slot < len(order):
+                    print(f"[Failover] {self.names[index]} failed ({payload}), trying {self.names[order[next_slot]]}")
+                    if self.on_retry is not None:
+                        self.on_retry(self.names[index])
+                    launch()
+                    deadline = time.monotonic() + self.hedge_after_seconds
+        raise errors[-1]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = next(self.stream_with(lambda candidate: [candidate.invoke(messages, stop=stop, **kwargs)]))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for chunk in self.stream_with(lambda candidate: candidate.stream(messages, stop=stop, **kwargs)):
+            chunk = chunk if isinstance(chunk, AIMessageChunk) else AIMessageChunk(content=chunk.content)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text(), chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
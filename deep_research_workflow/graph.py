@@ -1,7 +1,10 @@
+import os
+import sqlite3
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
 from .state import AgentState, ResearchState
 from .struct import SectionOutput
+from .tracing import traced_node
 from .nodes import (
     report_structure_planner_node,
     human_feedback_node,
@@ -15,19 +18,20 @@ from .nodes import (
     final_section_dataset_generator_node,
     schema_generator_node,
     human_feedback_on_schema_node,
-    final_dataset_aggregator_node
+    final_dataset_aggregator_node,
+    batch_dataset_generator_node,
 )
 
 
 research_builder = StateGraph(ResearchState, output=SectionOutput)
 
-research_builder.add_node("section_knowledge", section_knowledge_node)
-research_builder.add_node("query_generator", query_generator_node)
-research_builder.add_node("tavily_search", tavily_search_node)
-research_builder.add_node("result_accumulator", result_accumulator_node)
-research_builder.add_node("reflection", reflection_feedback_node)
-research_builder.add_node("final_section_formatter", final_section_formatter_node)
-research_builder.add_node("final_section_dataset_generator", final_section_dataset_generator_node)
+research_builder.add_node("section_knowledge", traced_node("section_knowledge", section_knowledge_node))
+research_builder.add_node("query_generator", traced_node("query_generator", query_generator_node))
+research_builder.add_node("tavily_search", traced_node("tavily_search", tavily_search_node))
+research_builder.add_node("result_accumulator", traced_node("result_accumulator", result_accumulator_node))
+research_builder.add_node("reflection", traced_node("reflection", reflection_feedback_node))
+research_builder.add_node("final_section_formatter", traced_node("final_section_formatter", final_section_formatter_node))
+research_builder.add_node("final_section_dataset_generator", traced_node("final_section_dataset_generator", final_section_dataset_generator_node))
 
 research_builder.add_edge(START, "section_knowledge")
 research_builder.add_edge("section_knowledge", "query_generator")
@@ -38,22 +42,37 @@ research_builder.add_edge("final_section_formatter", "final_section_dataset_gene
 research_builder.add_edge("final_section_dataset_generator", END)
 
 
-memory_saver = MemorySaver()
+def create_checkpointer(path: str) -> SqliteSaver:
+    """
+    Create a SQLite-backed checkpointer so runs survive crashes and can be resumed.
+
+    The ``research_agent`` subgraph inherits this checkpointer, so every node of every
+    section is checkpointed and a resumed run only re-executes unfinished work.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+checkpointer = create_checkpointer(os.environ.get("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite")))
 
 builder = StateGraph(AgentState)
 
-builder.add_node("schema_generator", schema_generator_node)
-builder.add_node("human_feedback_on_schema", human_feedback_on_schema_node)
-builder.add_node("report_structure_planner", report_structure_planner_node)
-builder.add_node("human_feedback_report_structure", human_feedback_node)
-builder.add_node("section_formatter", section_formatter_node)
+builder.add_node("schema_generator", traced_node("schema_generator", schema_generator_node))
+builder.add_node("human_feedback_on_schema", traced_node("human_feedback_on_schema", human_feedback_on_schema_node))
+builder.add_node("report_structure_planner", traced_node("report_structure_planner", report_structure_planner_node))
+builder.add_node("human_feedback_report_structure", traced_node("human_feedback_report_structure", human_feedback_node))
+builder.add_node("section_formatter", traced_node("section_formatter", section_formatter_node))
 builder.add_node("research_agent", research_builder.compile())
-builder.add_node("final_dataset_aggregator", final_dataset_aggregator_node)
+builder.add_node("batch_dataset_generator", traced_node("batch_dataset_generator", batch_dataset_generator_node))
+builder.add_node("final_dataset_aggregator", traced_node("final_dataset_aggregator", final_dataset_aggregator_node))
 
 builder.set_entry_point("schema_generator")
 builder.add_edge("schema_generator", "human_feedback_on_schema")
 builder.add_edge("report_structure_planner", "human_feedback_report_structure")
-builder.add_edge("research_agent", "final_dataset_aggregator")
+builder.add_edge("research_agent", "batch_dataset_generator")
+builder.add_edge("batch_dataset_generator", "final_dataset_aggregator")
 builder.add_edge("final_dataset_aggregator", END)
 
-agent_graph = builder.compile(checkpointer=memory_saver)
\ No newline at end of file
+agent_graph = builder.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .configuration import Configuration
+from .runs import save_run
+from .struct import DatasetSchema
+from .writers import open_dataset_writer
+from .dedup import RowDeduplicator, filter_section_rows
+from .metrics import get_run_metrics, save_report
+from .tracing import span
+
+# Job ids name the job's output files, so they must be a plain file name.
+JOB_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,127}")
+
+
+@dataclass
+class Job:
+    id: str
+    topic: str
+    outline: str
+    schema: Optional[DatasetSchema] = None
+    config: Dict[str, Any] = field(default_factory=dict)
+
+
+def load_jobs(path: str) -> List[Job]:
+    """
+    Read a JSONL file with one job per line.
+
+    Each line holds ``topic`` and ``outline`` and optionally an ``id``, a fixed ``schema``
+    (either ``{"generated_schema": [...]}`` or the bare list of fields) and ``config``
+    overrides for any ``Configuration`` field. Ids name the job's files in the output
+    directory, so they may only use letters, digits, ``.``, ``_`` and ``-`` and must start
+    with a letter or digit.
+
+    Raises:
+        ValueError: If a line is not valid JSON, misses ``topic``/``outline``, has an invalid
+            id or reuses one.
+    """
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+            if not data.get("topic") or not data.get("outline"):
+                raise ValueError(f"{path}:{line_number}: 'topic' and 'outline' are required")
+
+            job_id = str(data.get("id") or f"job_{line_number}")
+            if not JOB_ID_PATTERN.fullmatch(job_id):
+                raise ValueError(
+                    f"{path}:{line_number}: invalid job id {job_id!r}; use up to 128 letters, digits, '.', '_' or '-', starting with a letter or digit"
+                )
+            if any(job.id == job_id for job in jobs):
+                raise ValueError(f"{path}:{line_number}: duplicate job id {job_id!r}")
+
+            schema = data.get("schema")
+            if isinstance(schema, list):
+                schema = {"generated_schema": schema}
+            jobs.append(Job(
+                id=job_id,
+                topic=data["topic"],
+                outline=data["outline"],
+                schema=DatasetSchema.model_validate(schema) if schema else None,
+                config=data.get("config", {}),
+            ))
+    return jobs
+
+
+def run_job(graph, job: Job, output_dir: str) -> Dict[str, Any]:
+    """Run one job without human feedback, streaming its dataset rows to ``output_dir``."""
+    thread_id = str(uuid.uuid4())
+    configurable = {
+        **asdict(Configuration.from_runnable_config({})),
+        **job.config,
+        "thread_id": thread_id,
+        "auto_approve": True,
+    }
+    thread = {"configurable": configurable}
+    save_run(thread_id, {"topic": job.topic, "outline": job.outline, "configurable": configurable})
+
+    graph_input: Dict[str, Any] = {"topic": job.topic, "outline": job.outline}
+    if job.schema is not None:
+        graph_input["schema"] = job.schema
+
+    started = time.perf_counter()
+    entry: Dict[str, Any] = {"id": job.id, "thread_id": thread_id, "topic": job.topic}
+    try:
+        writer = open_dataset_writer(
+            os.path.join(output_dir, job.id),
+            configurable["output_format"],
+            configurable["output_compression"],
+            schema=job.schema,
+        )
+    except (ImportError, ValueError) as e:
+        # A bad output format fails this job alone, before any model is called.
+        entry.update({"status": "failed", "rows": 0, "output": None, "error": str(e), "seconds": 0.0})
+        return entry
+    # ``main.py --resume`` carries on writing to the same file.
+    save_run(thread_id, {
+        "topic": job.topic,
+        "outline": job.outline,
+        "configurable": configurable,
+        "output": {"path": writer.path, "format": configurable["output_format"], "compression": configurable["output_compression"]},
+    })
+    deduplicator = RowDeduplicator(near_duplicates=bool(configurable["dedup_rows_near"])) if configurable["dedup_rows"] else None
+    try:
+        with writer:
+            with span("run", run=thread_id, section="", job=job.id):
+                for event in graph.stream(graph_input, config=thread):
+                    if event.get("schema_generator"):
+                        writer.schema = event["schema_generator"]["schema"]
+                    for node in ("research_agent", "batch_dataset_generator"):
+                        if event.get(node):
+                            writer.write_rows(filter_section_rows(event[node], deduplicator))
+        entry.update({"status": "completed", "rows": writer.rows_written, "output": writer.path})
+        if deduplicator is not None:
+            entry["dedup"] = deduplicator.report()
+    except Exception as e:
+        entry.update({"status": "failed", "rows": writer.rows_written, "output": writer.part_path, "error": str(e)})
+    entry["seconds"] = round(time.perf_counter() - started, 2)
+    metrics = get_run_metrics(thread_id)
+    entry["report"] = save_report(metrics, os.path.join(output_dir, f"{job.id}.report.json"))
+    entry["metrics"] = metrics.totals()
+    return entry
+
+
+def run_jobs(
+        graph,
+        jobs: List[Job],
+        output_dir: str = "output_files",
+        max_workers: int = 2,
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run ``jobs`` on a bounded worker pool and write a summary manifest.
+
+    Every job gets its own thread id, so a failed job can be resumed on its own with
+    ``main.py --resume``. The manifest lists each job's status, row count, output file and
+    duration in the order the jobs were given.
+
+    Returns:
+        The manifest, which is also written to ``output_dir``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    entries: Dict[str, Dict[str, Any]] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job") as executor:
+        futures = {executor.submit(run_job, graph, job, output_dir): job for job in jobs}
+        for future in as_completed(futures):
+            entry = future.result()
+            entries[entry["id"]] = entry
+            if on_complete:
+                on_complete(entry)
+
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.perf_counter() - started, 2),
+        "jobs": [entries[job.id] for job in jobs],
+    }
+    path = os.path.join(output_dir, f"manifest_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    manifest["path"] = path
+    return manifest
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Estimated USD prices per million (input, output) tokens, matched on the longest model prefix.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+# Batch APIs bill completions at this fraction of the synchronous price.
+BATCH_DISCOUNT = 0.5
+
+# Estimated USD price of one live search request.
+SEARCH_PRICES: Dict[str, float] = {
+    "tavily": 0.008,
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    matches = [prefix for prefix in MODEL_PRICES if model and model.startswith(prefix)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "cached_calls": 0,
+        "errors": 0,
+        "retries": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "seconds": 0.0,
+        "cost": 0.0,
+    }
+
+
+class RunMetrics:
+    """
+    Token, latency, retry and cost totals for one run.
+
+    Calls are aggregated as they are recorded, keyed on node, section, kind ("llm" or
+    "search") and model, so memory does not grow with the number of calls.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started = time.time()
+        self._totals: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+            self,
+            node: str,
+            section: str = "",
+            kind: str = "llm",
+            model: str = "",
+            prompt_tokens: int = 0,
+            completion_tokens: int = 0,
+            seconds: float = 0.0,
+            cached: bool = False,
+            error: bool = False,
+            cost: Optional[float] = None,
+    ) -> None:
+        if cost is None:
+            cost = 0.0 if cached else estimate_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            totals = self._totals.setdefault((node, section, kind, model), _empty_totals())
+            totals["calls"] += 1
+            totals["cached_calls"] += int(cached)
+            totals["errors"] += int(error)
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["seconds"] += seconds
+            totals["cost"] += cost
+
+    def record_retry(self, node: str, section: str = "", kind: str = "llm", model: str = "") -> None:
+        with self._lock:
+            self._totals.setdefault((node, section, kind, model), _empty_totals())["retries"] += 1
+
+    def _rollup(self, key_index: Optional[int]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+        rollup: Dict[str, Dict[str, Any]] = {}
+        for key, totals in items:
+            name = key[key_index] if key_index is not None else "run"
+            target = rollup.setdefault(name, _empty_totals())
+            for field, value in totals.items():
+                target[field] += value
+        for totals in rollup.values():
+            totals["seconds"] = round(totals["seconds"], 3)
+            totals["cost"] = round(totals["cost"], 6)
+        return rollup
+
+    def by_node(self) -> Dict[str, Dict[str, Any]]:
+        return self._rollup(0)
+
+    def by_section(self) -> Dict[str, Dict[str, Any]]:
+        return {section: totals for section, totals in self._rollup(1).items() if section}
+
+    def totals(self) -> Dict[str, Any]:
+        return self._rollup(None).get("run", _empty_totals())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = [
+                {"node": node, "section": section, "kind": kind, "model": model, **totals}
+                for (node, section, kind, model), totals in self._totals.items()
+            ]
+        return {
+            "run_id": self.run_id,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_seconds": round(time.time() - self.started, 3),
+            "totals": self.totals(),
+            "by_node": self.by_node(),
+            "by_section": self.by_section(),
+            "calls": calls,
+        }
+
+
+def save_report(metrics: RunMetrics, path: str) -> str:
+    """Write the run report as JSON to ``path`` and return the path."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metrics.report(), f, indent=2, ensure_ascii=False)
+    return path
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records the tokens, latency and estimated cost of every chat completion made by a node."""
+
+    run_inline = True
+
+    def __init__(self, metrics: RunMetrics, node: str, section: str = "", model: str = "", cache=None, rate_limiter=None):
+        self.metrics = metrics
+        self.node = node
+        self.section = section
+        self.model = model
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self._started: Dict[UUID, float] = {}
+
+    def _seconds(self, run_id: UUID) -> float:
+        now = time.perf_counter()
+        started = self._started.pop(run_id, now)
+        if self.rate_limiter is not None:
+            # The model acquires its rate limiter after the start callback; time spent waiting
+            # there is the limiter's, not the provider's.
+            started = max(started, self.rate_limiter.last_acquired_at())
+        return now - started
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        seconds = self._seconds(run_id)
+        cached = self.cache is not None and self.cache.last_lookup_hit()
+        prompt_tokens = completion_tokens = 0
+        if not cached:
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        self.metrics.record(
+            self.node, self.section, "llm", self.model,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, seconds=seconds, cached=cached,
+        )
+
+    def record_cached_call(self) -> None:
+        """Record a call answered from the response cache without invoking the model."""
+        self.metrics.record(self.node, self.section, "llm", self.model, cached=True)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        seconds = self._seconds(run_id)
+        self.metrics.record(self.node, self.section, "llm", self.model, seconds=seconds, error=True)
+
+
+_run_metrics: "OrderedDict[str, RunMetrics]" = OrderedDict()
+_run_metrics_lock = threading.Lock()
+_MAX_TRACKED_RUNS = 32
+
+
+def get_run_metrics(run_id: str) -> RunMetrics:
+    """Return the metrics collector for the run ``run_id`` (its thread id)."""
+    with _run_metrics_lock:
+        metrics = _run_metrics.get(run_id)
+        if metrics is None:
+            metrics = _run_metrics[run_id] = RunMetrics(run_id)
+            while len(_run_metrics) > _MAX_TRACKED_RUNS:
+                _run_metrics.popitem(last=False)
+        _run_metrics.move_to_end(run_id)
+        return metrics
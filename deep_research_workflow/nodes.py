@@ -1,7 +1,6 @@
+import contextvars
 import time
 import json
-from openai import RateLimitError, OpenAIError
-from pydantic import ValidationError
 from langchain_core.runnables import RunnableConfig
 from langchain_core.prompts import (
     ChatPromptTemplate, 
@@ -9,15 +8,31 @@ from langchain_core.prompts import (
     HumanMessagePromptTemplate, 
     MessagesPlaceholder
 )
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, message_chunk_to_message, convert_to_openai_messages
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.outputs import ChatGeneration
 from langgraph.types import Command, Send
 from typing import Literal
-from tavily import TavilyClient
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from .struct import DatasetRecords
+from .parsing import JsonArrayStreamParser, parse_json_rows
+from .validation import validate_rows
 from .state import AgentState, ResearchState
 from .configuration import Configuration
-from .utils import init_llm, process_datagen_prompt
+from .utils import process_datagen_prompt, process_row_repair_prompt, fit_to_token_budget, count_tokens
+from .search import gather_before_deadline, get_query_registry, reciprocal_rank_fusion, run_searches
+from .retrieval import chunk_text, section_queries, select_relevant_chunks
+from .cache import get_search_cache, get_llm_cache
+from .clients import get_chat_model
+from .search_backends import SearchBackend, TavilySearchBackend, get_search_backend
+from .failover import FailoverChatModel, provider_error_kind
+from .rate_limit import get_rate_limiter, RateLimitUsageHandler
+from .dedup import ContentDeduplicator, RowDeduplicator, get_run_deduplicator
+from .metrics import BATCH_DISCOUNT, MetricsCallbackHandler, SEARCH_PRICES, estimate_cost, get_run_metrics
+from .batch import clear_batch_id, get_batch_backend, load_batch_id, save_batch_id
+from .tracing import TracingCallbackHandler, span, tracer
 from .prompts import (
     SCHEMA_GENERATION_PROMPT,
     REPORT_STRUCTURE_PLANNER_SYSTEM_PROMPT_TEMPLATE,
@@ -38,10 +53,108 @@ from .struct import (
 import time
 import os
 
-llm = init_llm(model="gpt-4o-mini", provider="openai")
-tavily_client = TavilyClient()
+# Clients are built on first use from the run's Configuration. Assign these to override them
+# for every node, e.g. with the offline fakes in ``benchmarks``.
+llm = None
+tavily_client = None
+
+# Fallback models that could not be created (e.g. no API key), reported once each.
+_unavailable_models = set()
+
+
+def _section_name(state) -> str:
+    section = state.get("section") if state else None
+    return section.section_name if section is not None else ""
+
+
+def _model_name(chat_model) -> str:
+    return getattr(chat_model, "model_name", None) or getattr(chat_model, "model", "") or ""
+
+
+def _chat_model(provider: str, model: str):
+    return llm if llm is not None else get_chat_model(provider, model)
+
+
+def _search_backend(name: str, configuration: Configuration) -> SearchBackend:
+    if name == "tavily" and tavily_client is not None:
+        return TavilySearchBackend(tavily_client)
+    return get_search_backend(name, configuration)
+
+
+def _node_model(node: str, configuration: Configuration, provider: str, model: str, temperature: float, cache, state=None):
+    chat_model = _chat_model(provider, model)
+    requests_per_minute, tokens_per_minute = configuration.rate_limits_for(provider)
+    limiter = get_rate_limiter(provider, requests_per_minute, tokens_per_minute)
+    metrics_handler = MetricsCallbackHandler(
+        get_run_metrics(configuration.thread_id),
+        node,
+        _section_name(state),
+        _model_name(chat_model),
+        cache=cache or None,
+        rate_limiter=limiter,
+    )
+    callbacks = [RateLimitUsageHandler(limiter), metrics_handler]
+    if tracer.enabled:
+        callbacks.append(TracingCallbackHandler(_model_name(chat_model)))
+    update = {"cache": cache, "rate_limiter": limiter, "callbacks": callbacks}
+    if "temperature" in type(chat_model).model_fields:
+        update["temperature"] = temperature
+    return chat_model.model_copy(update=update)
+
+
+def _node_llm(node: str, config: RunnableConfig, state=None):
+    """
+    Return the chat model configured for ``node``.
+
+    This is a copy of the shared client for the node's provider and model (see
+    ``Configuration.model_for``) at the node's temperature. The copy is wired to the on-disk
+    response cache (unless disabled for ``node``), to the provider's process-wide rate
+    limiter, which only applies to calls that miss the cache, and to the run's metrics,
+    attributed to ``node`` and the section in ``state``. With ``fallback_models`` set, the
+    node gets a ``FailoverChatModel`` over the configured model and its fallbacks.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    cache = False
+    if configuration.llm_cache_enabled_for(node):
+        cache = get_llm_cache(
+            os.path.join(configuration.cache_dir, "llm.sqlite"),
+            ttl_seconds=configuration.llm_cache_ttl_seconds,
+            max_entries=int(configuration.llm_cache_max_entries),
+        )
+    provider, model, temperature = configuration.model_for(node)
+    primary = _node_model(node, configuration, provider, model, temperature, cache, state)
+    fallbacks = [spec for spec in configuration.fallback_chain() if spec[:2] != (provider, model)]
+    if llm is not None or not fallbacks:
+        return primary
+
+    candidates, names = [primary], [f"{provider}:{model}"]
+    for fallback_provider, fallback_model, fallback_temperature in fallbacks:
+        name = f"{fallback_provider}:{fallback_model}"
+        try:
+            candidates.append(_node_model(node, configuration, fallback_provider, fallback_model, fallback_temperature, cache, state))
+        except (ImportError, ValueError) as e:
+            if name not in _unavailable_models:
+                _unavailable_models.add(name)
+                print(f"[Failover] Skipping {name}: {e}")
+            continue
+        names.append(name)
+    if len(candidates) == 1:
+        return primary
+    metrics = get_run_metrics(configuration.thread_id)
+    return FailoverChatModel(
+        candidates=candidates,
+        names=names,
+        hedge_after_seconds=float(configuration.hedge_after_seconds),
+        on_retry=lambda name: metrics.record_retry(node, _section_name(state), "llm", name.partition(":")[2]),
+    )
+
 
 def schema_generator_node(state: AgentState, config: RunnableConfig):
+    # A schema supplied with the run input is used as-is; it is only regenerated after feedback.
+    if state.get("schema") is not None and not state.get("messages"):
+        schema = state["schema"]
+        return {"schema": schema, "messages": [f"Using provided schema: \n{[schema.generated_schema]}"]}
+
     dataset_schema_generator_system_prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(SCHEMA_GENERATION_PROMPT),
         HumanMessagePromptTemplate.from_template(
@@ -53,7 +166,7 @@ def schema_generator_node(state: AgentState, config: RunnableConfig):
         MessagesPlaceholder(variable_name="messages")
     ])
 
-    llm_with_schema_tool = llm.bind_tools(tools=[DatasetSchema], tool_choice="required")
+    llm_with_schema_tool = _node_llm("schema_generator", config).bind_tools(tools=[DatasetSchema], tool_choice="required")
     schema_generator_llm = dataset_schema_generator_system_prompt | llm_with_schema_tool
 
     result = schema_generator_llm.invoke(state)
@@ -62,7 +175,10 @@ def schema_generator_node(state: AgentState, config: RunnableConfig):
     return {"schema": suggested_schema, "messages": [f"Generated schema: \n{[suggested_schema.generated_schema]}"]}
 
 def human_feedback_on_schema_node(state: AgentState, config: RunnableConfig) -> Command[Literal["report_structure_planner", "schema_generator"]]:
-    human_message = input("Please provide feedback on the report structure (type 'continue' to continue): ")
+    if Configuration.from_runnable_config(config).auto_approve:
+        human_message = "continue"
+    else:
+        human_message = input("Please provide feedback on the report structure (type 'continue' to continue): ")
     schema = state.get("schema")
     if human_message == "continue":
         return Command(
@@ -88,13 +204,16 @@ def report_structure_planner_node(state: AgentState, config: RunnableConfig):
         MessagesPlaceholder(variable_name="messages")
     ])
 
-    report_structure_planner_llm = report_structure_planner_system_prompt | llm
+    report_structure_planner_llm = report_structure_planner_system_prompt | _node_llm("report_structure_planner", config)
     result = report_structure_planner_llm.invoke(state)
 
     return {"messages": [result]}
 
 def human_feedback_node(state: AgentState, config: RunnableConfig)->Command[Literal["section_formatter", "report_structure_planner"]]:
-    human_message = input("Please provide feedback on the report structure (type 'continue' to continue): ")
+    if Configuration.from_runnable_config(config).auto_approve:
+        human_message = "continue"
+    else:
+        human_message = input("Please provide feedback on the report structure (type 'continue' to continue): ")
     report_structure = state.get("messages")[-1].content
     if human_message == "continue":
         return Command(
@@ -114,7 +233,7 @@ def section_formatter_node(state: AgentState, config: RunnableConfig) -> Command
         HumanMessagePromptTemplate.from_template(template="{report_structure}"),
     ])
 
-    section_formatter_llm = section_formatter_system_prompt | llm.with_structured_output(Sections)
+    section_formatter_llm = section_formatter_system_prompt | _node_llm("section_formatter", config).with_structured_output(Sections)
     result = section_formatter_llm.invoke(state)
     schema = state.get("schema")
     report_structure = state.get("report_structure")
@@ -141,7 +260,7 @@ def section_knowledge_node(state: ResearchState, config: RunnableConfig):
         HumanMessagePromptTemplate.from_template(template="{section}"),
     ])
 
-    section_knowledge_llm = section_knowledge_system_prompt | llm
+    section_knowledge_llm = section_knowledge_system_prompt | _node_llm("section_knowledge", config, state)
     result = section_knowledge_llm.invoke(state)
     return {"knowledge": result.content}
 
@@ -152,7 +271,7 @@ def query_generator_node(state: ResearchState, config: RunnableConfig):
         HumanMessagePromptTemplate.from_template(template="Section: {section}\nPrevious Queries: {searched_queries}\nReflection Feedback: {reflection_feedback}"),
     ])
 
-    query_generator_llm = query_generator_system_prompt | llm.with_structured_output(Queries)
+    query_generator_llm = query_generator_system_prompt | _node_llm("query_generator", config, state).with_structured_output(Queries)
     state.setdefault("reflection_feedback", "")
     state.setdefault("searched_queries", [])
     configurable = config.get("configurable")
@@ -167,25 +286,219 @@ def query_generator_node(state: ResearchState, config: RunnableConfig):
 
 def tavily_search_node(state: ResearchState, config: RunnableConfig):
     queries = state["generated_queries"]
-    configurable = config.get("configurable")
-    search_results = []
-    for query in queries:
-        raw_content = []
-        response = tavily_client.search(query=query.query, max_results=configurable.get("search_depth"), include_raw_content=True)
-        for result in response["results"]:
-            raw_content.append(result['content'])
-        search_results.append(SearchResult(query=query, raw_content=raw_content))
+    configuration = Configuration.from_runnable_config(config)
+    timeout = float(configuration.search_timeout_seconds)
+    backends = [_search_backend(name, configuration) for name in configuration.search_backend_names()]
+    max_results = int(configuration.search_depth)
+    cache = None
+    if configuration.search_cache_enabled and any(backend.remote for backend in backends):
+        cache = get_search_cache(
+            os.path.join(configuration.cache_dir, "search.sqlite"),
+            ttl_seconds=configuration.search_cache_ttl_seconds,
+            max_entries=int(configuration.search_cache_max_entries),
+        )
+
+    def params_for(backend):
+        params = {"max_results": max_results, "include_raw_content": True}
+        if backend.name != "tavily":
+            # Keyed by backend, leaving the keys of results already cached from Tavily unchanged.
+            params["backend"] = backend.name
+        return params
+
+    limiters = {
+        backend.name: get_rate_limiter(backend.name, int(configuration.search_requests_per_minute))
+        for backend in backends
+        if backend.remote
+    }
+    search_params = params_for(backends[0])
+    if len(backends) > 1:
+        search_params = {"max_results": max_results, "include_raw_content": True, "backends": ",".join(b.name for b in backends)}
+    registry = None
+    if configuration.query_registry_enabled:
+        registry = get_query_registry(configuration.thread_id, float(configuration.query_similarity_threshold))
+
+    metrics = get_run_metrics(configuration.thread_id)
+    section_name = _section_name(state)
+    # Queries answered with another section's results, by id.
+    shared = set()
+    # Fan-out searches get their own pool, since the query workers block waiting on them.
+    fan_out_executor = None
+    if len(backends) > 1:
+        fan_out_executor = ThreadPoolExecutor(
+            max_workers=int(configuration.search_concurrency) * len(backends),
+            thread_name_prefix="search-backend",
+        )
+
+    def search(query):
+        # Searches run on worker threads, so each one opens its span on a lane of its own.
+        with span("search", run=configuration.thread_id, section=section_name, concurrent=True, query=query.query):
+            return lookup(query)
+
+    def lookup(query):
+        if registry is None:
+            return gather(query)
+        fetched = False
+
+        def fetch_once():
+            nonlocal fetched
+            fetched = True
+            return gather(query)
+
+        # Sections share one registry per run, so a query another section has already
+        # searched (or is searching right now) reuses its results.
+        raw_content = registry.search(query.query, search_params, fetch_once, timeout)
+        if not fetched:
+            shared.add(id(query))
+            for backend in backends:
+                metrics.record("tavily_search", section_name, "search", backend.name, cached=True)
+        return raw_content
+
+    def gather(query):
+        if fan_out_executor is None:
+            return [result["content"] for result in fetch(backends[0], query)]
+        rankings = gather_before_deadline(
+            {backend.name: partial(fetch, backend, query) for backend in backends},
+            fan_out_executor,
+            deadline=float(configuration.search_backend_deadline_seconds),
+            timeout=timeout,
+        )
+        fused = reciprocal_rank_fusion(list(rankings.values()), k=int(configuration.search_fusion_k))
+        return [result["content"] for result in fused]
+
+    def fetch(backend, query):
+        params = params_for(backend)
+        if cache is not None and backend.remote and not configuration.search_cache_bypass:
+            cached = cache.get_results(query.query, **params)
+            if cached is not None:
+                metrics.record("tavily_search", section_name, "search", backend.name, cached=True)
+                # Entries written before results kept their URLs hold the content alone.
+                return [result if isinstance(result, dict) else {"url": None, "content": result} for result in cached]
+        retries = int(configuration.search_retries)
+        for attempt in range(retries + 1):
+            if backend.name in limiters:
+                limiters[backend.name].acquire()
+            started = time.perf_counter()
+            try:
+                with span(f"{backend.name}.search"):
+                    results = backend.search(query.query, max_results, timeout)
+                break
+            except Exception as e:
+                metrics.record("tavily_search", section_name, "search", backend.name, seconds=time.perf_counter() - started, error=True)
+                # Only transient provider errors (rate limits, timeouts, connection drops) are worth another try.
+                if attempt == retries or provider_error_kind(e) is None:
+                    raise
+                metrics.record_retry("tavily_search", section_name, "search", backend.name)
+                print(f"[Search Retry] {backend.name}: {e} (Attempt {attempt + 1}/{retries})")
+                time.sleep(0.5 * 2 ** attempt)
+        metrics.record(
+            "tavily_search", section_name, "search", backend.name,
+            seconds=time.perf_counter() - started, cost=SEARCH_PRICES.get(backend.name, 0.0),
+        )
+        results = [{"url": result.get("url"), "content": result["content"]} for result in results]
+        if cache is not None and backend.remote:
+            cache.set_results(query.query, results, **params)
+        return results
+
+    try:
+        raw_contents = run_searches(
+            queries,
+            search,
+            max_concurrency=int(configuration.search_concurrency),
+            timeout=timeout,
+        )
+    finally:
+        if fan_out_executor is not None:
+            # Backends past their deadline finish (and fill the cache) in the background.
+            fan_out_executor.shutdown(wait=False)
+    if configuration.dedup_search_content:
+        shared_indices = {index for index, query in enumerate(queries) if id(query) in shared}
+        raw_contents = _drop_duplicate_content(state, configuration, raw_contents, shared_indices)
+
+    search_results = [
+        SearchResult(query=query, raw_content=raw_content)
+        for query, raw_content in zip(queries, raw_contents)
+    ]
     return {"search_results": search_results}
 
+
+def _drop_duplicate_content(state: ResearchState, configuration: Configuration, raw_contents, shared=frozenset()):
+    """
+    Drop content that duplicates or nearly duplicates what this section (or run) has already seen.
+
+    Results at the indices in ``shared`` were handed over by the query registry after another
+    section searched them, so the run-wide deduplicator has seen them already; they are only
+    checked against this section's own content.
+    """
+    max_distance = int(configuration.dedup_max_distance)
+    run_deduplicator = None
+    if configuration.dedup_across_sections:
+        run_deduplicator = get_run_deduplicator(configuration.thread_id, max_distance)
+    deduplicator = ContentDeduplicator(max_distance)
+    deduplicator.seed(content for result in state.get("search_results", []) for content in result.raw_content)
+
+    kept = []
+    for index, raw_content in enumerate(raw_contents):
+        if run_deduplicator is not None and index not in shared:
+            raw_content = run_deduplicator.filter(raw_content)
+        kept.append(deduplicator.filter(raw_content))
+    dropped = sum(map(len, raw_contents)) - sum(map(len, kept))
+    if dropped:
+        tokens_saved = sum(count_tokens(c) for r in raw_contents for c in r) - sum(count_tokens(c) for r in kept for c in r)
+        print(f"[Dedup] {state['section'].section_name}: dropped {dropped} duplicate result(s), ~{tokens_saved} tokens saved")
+    return kept
+
+def _format_search_results(search_results, token_budget):
+    contents = [content for result in search_results for content in result.raw_content]
+    fitted = iter(fit_to_token_budget(contents, token_budget))
+    blocks = []
+    for result in search_results:
+        lines = [f"Query: {result.query.query}"]
+        lines.extend(f"- {next(fitted)}" for _ in result.raw_content)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def _retrieve_relevant_content(state: ResearchState, configuration: Configuration, search_results, token_budget):
+    """Keep only the chunks of ``search_results`` that match the section's sub-sections."""
+    selected = select_relevant_chunks(
+        search_results,
+        section_queries(state["section"]),
+        token_budget,
+        top_k=int(configuration.retrieval_top_k),
+        chunk_tokens=int(configuration.retrieval_chunk_tokens),
+    )
+    before = sum(count_tokens(c) for r in search_results for c in r.raw_content)
+    after = sum(count_tokens(c) for r in selected for c in r.raw_content)
+    if after < before:
+        print(f"[Retrieval] {state['section'].section_name}: kept ~{after} of ~{before} tokens of search content")
+    return selected
+
+
 def result_accumulator_node(state: ResearchState, config: RunnableConfig):
+    configuration = Configuration.from_runnable_config(config)
+    search_results = state.get("search_results", [])
+    processed = state.get("accumulated_results_count", 0)
+    new_results = search_results[processed:]
+    if not new_results:
+        return {"accumulated_results_count": len(search_results)}
+    token_budget = int(configuration.accumulator_token_budget)
+    if configuration.retrieval_enabled:
+        new_results = _retrieve_relevant_content(state, configuration, new_results, token_budget)
+
     result_accumulator_system_prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(RESULT_ACCUMULATOR_SYSTEM_PROMPT_TEMPLATE),
-        HumanMessagePromptTemplate.from_template(template="{search_results}"),
+        HumanMessagePromptTemplate.from_template(template="Accumulated Content: {accumulated_content}\nNew Search Results:\n{search_results}"),
     ])
 
-    result_accumulator_llm = result_accumulator_system_prompt | llm
-    result = result_accumulator_llm.invoke(state)
-    return {"accumulated_content": result.content}
+    # Earlier results are already folded into accumulated_content, so only the new ones are
+    # sent, trimmed to a fixed budget; the prompt no longer grows with every reflection pass.
+    result_accumulator_llm = result_accumulator_system_prompt | _node_llm("result_accumulator", config, state)
+    result = result_accumulator_llm.invoke({
+        "accumulated_content": state.get("accumulated_content", ""),
+        "search_results": _format_search_results(new_results, token_budget),
+        "max_content_tokens": int(configuration.accumulated_content_max_tokens),
+    })
+    return {"accumulated_content": result.content, "accumulated_results_count": len(search_results)}
 
 
 def reflection_feedback_node(state: ResearchState, config: RunnableConfig) -> Command[Literal["final_section_formatter", "query_generator"]]:
@@ -194,12 +507,12 @@ def reflection_feedback_node(state: ResearchState, config: RunnableConfig) -> Co
         HumanMessagePromptTemplate.from_template(template="Section: {section}\nAccumulated Content: {accumulated_content}"),
     ])
 
-    reflection_feedback_llm = reflection_feedback_system_prompt | llm.with_structured_output(Feedback)
+    reflection_feedback_llm = reflection_feedback_system_prompt | _node_llm("reflection", config, state).with_structured_output(Feedback)
     reflection_count = state.get("reflection_count", 0)
-    configurable = config.get("configurable")
     result = reflection_feedback_llm.invoke(state)
     feedback = result.feedback
-    if (feedback == True) or (feedback.lower() == "true") or (reflection_count < configurable.get("num_reflections")):
+    # Stop once the section is judged complete or the reflection budget is spent.
+    if (feedback == True) or (str(feedback).lower() == "true") or (reflection_count >= int(Configuration.from_runnable_config(config).num_reflections)):
         return Command(
             update={"reflection_feedback": feedback},
             goto="final_section_formatter"
@@ -217,70 +530,348 @@ def final_section_formatter_node(state: ResearchState, config: RunnableConfig):
         HumanMessagePromptTemplate.from_template(template="Internal Knowledge: {knowledge}\nSearch Result content: {accumulated_content}"),
     ])
 
-    final_section_formatter_llm = final_section_formatter_system_prompt | llm
+    final_section_formatter_llm = final_section_formatter_system_prompt | _node_llm("final_section_formatter", config, state)
     result = final_section_formatter_llm.invoke(state)
     return {"final_section_content": result.content}
 
 
-def final_section_dataset_generator_node(state: ResearchState, config: RunnableConfig, max_retries: int = 3, base_wait: float = 2.0):
-    schema = state.get("schema")
-    max_rows = config.get("configurable").get("max_rows_from_each_section")
-    FINAL_SECTION_DATASET_GENERATION_PROMPT = process_datagen_prompt(schema.generated_schema, int(max_rows))
-
+def _stream_llm_text(llm, messages, read_cache: bool = True, cache_if=None):
+    """
+    Stream the completion for ``messages`` as text chunks.
+
+    LangChain's ``stream`` skips the response cache that ``invoke`` uses, so look it up and
+    update it here to keep streamed calls cacheable like every other node. A failover chain
+    races this per candidate, so each model keeps its own cache entries.
+
+    Pass ``read_cache=False`` for a retry, which must not replay the answer it is retrying,
+    and ``cache_if`` (called with the full text) to only cache completions that are usable.
+    """
+    if isinstance(llm, FailoverChatModel):
+        yield from llm.stream_with(lambda candidate: _stream_llm_text(candidate, messages, read_cache, cache_if))
+        return
+
+    cache = llm.cache if isinstance(llm.cache, BaseCache) else None
+    if cache is not None:
+        prompt, llm_string = dumps(messages), llm._get_llm_string()
+    if cache is not None and read_cache:
+        cached = cache.lookup(prompt, llm_string)
+        if cached:
+            for handler in llm.callbacks or []:
+                if isinstance(handler, MetricsCallbackHandler):
+                    handler.record_cached_call()
+            yield cached[0].message.text()
+            return
+
+    full = None
+    for chunk in llm.stream(messages):
+        full = chunk if full is None else full + chunk
+        yield chunk.text()
+
+    if cache is not None and full is not None and (cache_if is None or cache_if(full.text())):
+        cache.update(prompt, llm_string, [ChatGeneration(message=message_chunk_to_message(full))])
+
+
+def _repair_rows(llm, invalid_rows, schema):
+    """Ask the model to fix only the rows that failed validation; rows that still fail are dropped."""
+    messages = [
+        SystemMessage(content=process_row_repair_prompt(schema.generated_schema)),
+        HumanMessage(content=json.dumps(invalid_rows, ensure_ascii=False, indent=2)),
+    ]
+    try:
+        repaired = parse_json_rows(_stream_llm_text(llm, messages))
+    except Exception as e:
+        print(f"[Row Repair Error] {e}")
+        return []
+
+    valid_rows, still_invalid = validate_rows(repaired, schema)
+    if still_invalid or len(valid_rows) < len(invalid_rows):
+        print(f"[Row Repair] Dropped {len(invalid_rows) - len(valid_rows)} row(s) that could not be repaired")
+    return valid_rows[:len(invalid_rows)]
+
+
+# Top-up prompts list at most this many of the rows already generated, so a large section
+# does not push its whole dataset back into every request.
+MAX_EXISTING_ROWS_IN_PROMPT = 100
+
+
+def _dataset_generation_messages(state: ResearchState, schema, missing: int, rows, focus=None, content=None, variant: int = 1):
+    # Top-up requests only ask for the rows that are still missing.
+    human_template = "Report Structure: {report_structure}\nSection Contents: {final_section_content}"
+    if focus:
+        human_template += "\nOnly generate rows about this part of the section: {focus}"
+    if variant > 1:
+        # Parallel requests for the same part would otherwise send identical prompts.
+        human_template += "\nOther requests are covering this same material in parallel; this is request {variant}, so cover different facts than the most obvious ones."
+    if rows:
+        human_template += "\nRows already generated, do not repeat them: {existing_rows}"
     final_section_dataset_generator_prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content=FINAL_SECTION_DATASET_GENERATION_PROMPT),
-        HumanMessagePromptTemplate.from_template(template="Report Structure: {report_structure}\nSection Contents: {final_section_content}"),
+        SystemMessage(content=process_datagen_prompt(schema.generated_schema, missing)),
+        HumanMessagePromptTemplate.from_template(template=human_template),
     ])
-    final_dataset_generator_llm = final_section_dataset_generator_prompt | llm
-
+    first_key = schema.generated_schema[0].key if schema.generated_schema else None
+    return final_section_dataset_generator_prompt.invoke({
+        **state,
+        "final_section_content": state["final_section_content"] if content is None else content,
+        "focus": focus or "",
+        "variant": variant,
+        "existing_rows": json.dumps([row.get(first_key) for row in rows[-MAX_EXISTING_ROWS_IN_PROMPT:]], ensure_ascii=False),
+    }).to_messages()
+
+
+def _generate_rows(llm, state: ResearchState, config: RunnableConfig, schema, target: int, max_retries: int, base_wait: float,
+                   focus=None, content=None, existing=(), variant: int = 1):
+    """Stream ``target`` valid rows from ``llm``, asking again for whatever a short answer left out."""
+    rows = []
+    error = None
     for attempt in range(max_retries):
-        try:
-            result = final_dataset_generator_llm.invoke(state)
-            raw_text = result.content
+        missing = target - len(rows)
+        if missing <= 0:
+            break
+        if attempt:
+            get_run_metrics(Configuration.from_runnable_config(config).thread_id).record_retry(
+                "final_section_dataset_generator", _section_name(state), "llm", _model_name(llm),
+            )
 
-            # Clean up markdown wrapping
-            if raw_text.startswith("```json"):
-                raw_text = raw_text[len("```json"):].lstrip()
-            elif raw_text.startswith("```"):
-                raw_text = raw_text[len("```"):].lstrip()
-            if raw_text.endswith("```"):
-                raw_text = raw_text[:-3].rstrip()
+        messages = _dataset_generation_messages(state, schema, missing, [*existing, *rows], focus, content, variant)
 
-            parsed_json = json.loads(raw_text)
-            final_package = {"dataset": parsed_json}
-            validated = DatasetRecords(**final_package)
+        parser = JsonArrayStreamParser()
+        new_rows = []
+        stop = False
 
-            return {"final_section_dataset": validated.dataset}
+        def complete(text, missing=missing):
+            # Truncated or malformed answers are not cached, so a later run asks again.
+            return len(validate_rows(parse_json_rows([text]), schema)[0]) >= missing
 
-        except json.JSONDecodeError as e:
-            print(f"[JSON Parse Error] {e}")
-            return {"final_section_dataset": [], "error": "JSONDecodeError"}
+        try:
+            with span("generation_attempt", attempt=attempt + 1, missing_rows=missing):
+                for text in _stream_llm_text(llm, messages, read_cache=not attempt, cache_if=complete):
+                    new_rows.extend(parser.feed(text))
 
-        except ValidationError as e:
-            print(f"[Pydantic Validation Error] {e}")
-            return {"final_section_dataset": [], "error": "ValidationError"}
+        except Exception as e:
+            kind = provider_error_kind(e)
+            if kind == "rate_limit":
+                wait_time = base_wait * (2 ** attempt)
+                print(f"[Rate Limit] Retrying in {wait_time}s (Attempt {attempt + 1}/{max_retries})...")
+                error = "Max retries exceeded"
+                time.sleep(wait_time)
+            elif kind == "provider":
+                print(f"[Provider Error] {e}")
+                error = "Max retries exceeded"
+                wait_time = base_wait * (2 ** attempt)
+                time.sleep(wait_time)
+            else:
+                print(f"[Unexpected Error] {e}")
+                error = str(e)
+                stop = True
+
+        # Rows that streamed in before a truncation or an error are still usable.
+        new_rows.extend(parser.close())
+        valid_rows, invalid_rows = validate_rows(new_rows, schema)
+        if invalid_rows:
+            print(f"[Pydantic Validation Error] {len(invalid_rows)} row(s) failed validation, repairing them")
+            valid_rows.extend(_repair_rows(llm, invalid_rows, schema))
+
+        rows.extend(valid_rows[:missing])
+        if len(valid_rows) < missing and not stop:
+            error = f"Incomplete output: {len(rows)}/{target} rows"
+            print(f"[Incomplete Output] Got {len(valid_rows)}/{missing} valid rows (Attempt {attempt + 1}/{max_retries})")
+        if stop:
+            break
+    return rows, error
+
+
+def _generation_partitions(state: ResearchState, count: int):
+    """
+    Split a section into about ``count`` ``(focus, content)`` parts for chunked generation.
+
+    Each sub-section is a focus, and when there are more requests than sub-sections the
+    section content is also split into pieces, so requests pair a sub-section with a piece
+    instead of repeating the same prompt.
+    """
+    focuses = list(state["section"].sub_sections) or [None]
+    content = state["final_section_content"]
+    if not isinstance(content, str):
+        content = "\n\n".join(content)
+    pieces_per_focus = -(-count // len(focuses))
+    pieces = [None]
+    if pieces_per_focus > 1:
+        pieces = chunk_text(content, max(200, count_tokens(content) // pieces_per_focus)) or [None]
+    return [(focus, piece) for piece in pieces for focus in focuses]
+
+
+def _generate_rows_in_chunks(llm, state: ResearchState, config: RunnableConfig, schema, target: int, max_retries: int, base_wait: float):
+    """
+    Generate a large row target as many smaller requests running in parallel.
+
+    Each request asks for at most ``generation_chunk_rows`` rows about one part of the
+    section (see ``_generation_partitions``), with at most ``generation_concurrency`` in
+    flight. Rows are deduplicated as they are merged, and rounds of top-up requests, which
+    list the rows generated so far, replace what duplicates and short answers left out.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    chunk_rows = int(configuration.generation_chunk_rows)
+    partitions = _generation_partitions(state, -(-target // chunk_rows))
+    deduplicator = RowDeduplicator(near_duplicates=configuration.dedup_rows_near)
+    section_name = _section_name(state)
+    rows = []
+    error = None
+    next_partition = 0
+
+    def generate(size, focus, content, existing, variant):
+        with span("generation_chunk", concurrent=True, rows=size, focus=focus or ""):
+            return _generate_rows(llm, state, config, schema, size, max_retries, base_wait, focus, content, existing, variant)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, int(configuration.generation_concurrency)), thread_name_prefix="datagen")
+    try:
+        for round_number in range(max_retries):
+            missing = target - len(rows)
+            if missing <= 0:
+                break
+            sizes = [min(chunk_rows, missing - start) for start in range(0, missing, chunk_rows)]
+            if round_number:
+                print(f"[Top Up] {section_name}: {missing} row(s) missing, requesting {len(sizes)} more chunk(s)")
+            existing = tuple(rows) if round_number else ()
+            futures = []
+            for size in sizes:
+                focus, content = partitions[next_partition % len(partitions)]
+                variant = next_partition // len(partitions) + 1
+                next_partition += 1
+                # Each chunk runs in a copy of this context, so its spans stay in this run and section.
+                futures.append(executor.submit(contextvars.copy_context().run, generate, size, focus, content, existing, variant))
+            duplicates = 0
+            for future in futures:
+                chunk, chunk_error = future.result()
+                error = chunk_error or error
+                kept = deduplicator.filter(chunk, section_name)
+                duplicates += len(chunk) - len(kept)
+                rows.extend(kept[:target - len(rows)])
+            if duplicates:
+                print(f"[Dedup] {section_name}: dropped {duplicates} duplicate generated row(s)")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if len(rows) < target:
+        return rows, error or f"Incomplete output: {len(rows)}/{target} rows"
+    return rows, None
 
-        except RateLimitError:
-            wait_time = base_wait * (2 ** attempt)
-            print(f"[Rate Limit] Retrying in {wait_time}s (Attempt {attempt + 1}/{max_retries})...")
-            time.sleep(wait_time)
 
-        except OpenAIError as e:
-            print(f"[OpenAI Error] {e}")
-            wait_time = base_wait * (2 ** attempt)
-            time.sleep(wait_time)
+def final_section_dataset_generator_node(state: ResearchState, config: RunnableConfig, max_retries: int = 3, base_wait: float = 2.0):
+    schema = state.get("schema")
+    configuration = Configuration.from_runnable_config(config)
+    max_rows = int(configuration.max_rows_from_each_section)
+    if configuration.dataset_generation_mode == "batch":
+        # The request is sent later, together with every other section's, by batch_dataset_generator_node.
+        provider, model, temperature = configuration.model_for("final_section_dataset_generator")
+        messages = _dataset_generation_messages(state, schema, max_rows, [])
+        return {"final_section_dataset": [], "batch_requests": [{
+            "section_name": state["section"].section_name,
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "messages": convert_to_openai_messages(messages),
+        }]}
+
+    final_dataset_generator_llm = _node_llm("final_section_dataset_generator", config, state)
+    chunk_rows = int(configuration.generation_chunk_rows)
+    if 0 < chunk_rows < max_rows:
+        rows, error = _generate_rows_in_chunks(final_dataset_generator_llm, state, config, schema, max_rows, max_retries, base_wait)
+    else:
+        rows, error = _generate_rows(final_dataset_generator_llm, state, config, schema, max_rows, max_retries, base_wait)
+
+    section_stats = [{"section_name": state["section"].section_name, "rows": len(rows)}]
+    if len(rows) >= max_rows:
+        return {"final_section_dataset": rows, "section_stats": section_stats}
+    return {"final_section_dataset": rows, "section_stats": section_stats, "error": error}
+
+def _complete_batch_request(request):
+    """Run one batch request synchronously; used by the local batch backend."""
+    response = _chat_model(request["provider"], request["model"]).invoke(request["messages"], temperature=request["temperature"])
+    usage = response.usage_metadata or {}
+    return {
+        "content": response.text(),
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": usage.get("output_tokens", 0),
+    }
 
-        except Exception as e:
-            print(f"[Unexpected Error] {e}")
-            return {"final_section_dataset": [], "error": str(e)}
 
-    return {"final_section_dataset": [], "error": "Max retries exceeded"}
+def batch_dataset_generator_node(state: AgentState, config: RunnableConfig):
+    """
+    Generate every section's dataset rows in one deferred batch job.
+
+    Only does anything in ``batch`` dataset generation mode, where the research agents queue
+    their requests instead of calling the model. The batch id is saved under ``cache_dir`` so
+    a resumed run keeps polling the job it already submitted, unless that job failed. Rows that fail validation are
+    repaired synchronously; sections that come back short are not topped up.
+    """
+    requests = state.get("batch_requests") or []
+    if not requests:
+        return {}
+    configuration = Configuration.from_runnable_config(config)
+    schema = state.get("schema")
+    batch_dir = os.path.join(configuration.cache_dir, "batches")
+    backend = get_batch_backend(configuration.batch_backend, batch_dir, _complete_batch_request)
+    batch_requests = [{"custom_id": f"section-{i}", **request} for i, request in enumerate(requests)]
+
+    record_path = os.path.join(batch_dir, f"{configuration.thread_id}.json")
+    batch_id = load_batch_id(record_path, backend.name)
+    if batch_id is None:
+        batch_id = backend.submit(batch_requests)
+        save_batch_id(record_path, backend.name, batch_id)
+        print(f"[Batch] Submitted {len(batch_requests)} section request(s) as {batch_id}")
+    else:
+        print(f"[Batch] Resuming {batch_id}")
+
+    deadline = time.monotonic() + float(configuration.batch_timeout_seconds)
+    while True:
+        status = backend.status(batch_id)
+        if status != "pending":
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} did not finish in {configuration.batch_timeout_seconds}s; resume the run to keep waiting")
+        print(f"[Batch] {batch_id} is still running, checking again in {configuration.batch_poll_seconds}s")
+        time.sleep(float(configuration.batch_poll_seconds))
+    if status == "failed":
+        # A failed, expired or cancelled batch never completes; polling it again would fail the same way.
+        clear_batch_id(record_path)
+        raise RuntimeError(f"Batch {batch_id} failed; resume the run to submit it again")
+
+    results = backend.results(batch_id)
+    metrics = get_run_metrics(configuration.thread_id)
+    repair_llm = _node_llm("final_section_dataset_generator", config)
+    max_rows = int(configuration.max_rows_from_each_section)
+    dataset, section_stats = [], []
+    for request in batch_requests:
+        section_name = request["section_name"]
+        result = results.get(request["custom_id"]) or {"error": "missing from batch output"}
+        rows = []
+        if "error" in result:
+            print(f"[Batch Error] {section_name}: {result['error']}")
+            metrics.record("final_section_dataset_generator", section_name, "llm", request["model"], error=True)
+        else:
+            prompt_tokens, completion_tokens = result.get("prompt_tokens", 0), result.get("completion_tokens", 0)
+            metrics.record(
+                "final_section_dataset_generator", section_name, "llm", request["model"],
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                cost=estimate_cost(request["model"], prompt_tokens, completion_tokens) * BATCH_DISCOUNT,
+            )
+            rows, invalid_rows = validate_rows(parse_json_rows([result["content"]]), schema)
+            if invalid_rows:
+                print(f"[Pydantic Validation Error] {len(invalid_rows)} row(s) in {section_name} failed validation, repairing them")
+                rows.extend(_repair_rows(repair_llm, invalid_rows, schema))
+            rows = rows[:max_rows]
+            if len(rows) < max_rows:
+                print(f"[Incomplete Output] {section_name}: got {len(rows)}/{max_rows} valid rows from the batch")
+        dataset.extend(rows)
+        section_stats.append({"section_name": section_name, "rows": len(rows)})
+
+    return {"final_section_dataset": dataset, "section_stats": section_stats}
 
-def final_dataset_aggregator_node(state: AgentState, config: RunnableConfig):
-    dataset = []
-    section_datasets = state.get("final_section_dataset")
 
-    for section_dataset in section_datasets:
-            dataset.append(section_dataset)
-    
-    return {"final_dataset": dataset}
\ No newline at end of file
+def final_dataset_aggregator_node(state: AgentState, config: RunnableConfig):
+    """
+    Mark the end of the run.
+
+    Rows are not deduplicated or collected again here: the caller streams each section's
+    rows to its dataset writer, deduplicating them on the way, as the ``research_agent``
+    and ``batch_dataset_generator`` updates arrive.
+    """
+    return {}
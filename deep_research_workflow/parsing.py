@@ -0,0 +1,146 @@
+import json
+from typing import Any, Dict, Iterable, List
+
+
+class JsonArrayStreamParser:
+    """
+    Incrementally parses a JSON array of objects out of streamed model output.
+
+    Text is fed in as it arrives and every object is returned as soon as its closing brace
+    is seen. The rows are read from the first array that opens with an object; anything
+    before it (a markdown fence, or prose such as "fields [question, answer]") is ignored,
+    and an array that closes without yielding a row does not end parsing. When the stream
+    ends, ``close`` salvages the well-formed objects that follow a broken one, so a
+    truncated or partly malformed completion still yields every complete row. Only objects
+    directly inside the row array count as rows, never ones nested in a broken row.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = -1
+        self._search = 0
+        self._array_rows = 0
+        self._pending_close = False
+        self.done = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        if self.done or not text:
+            return []
+        self._buffer += text
+        if "}" in text or "]" in text:
+            self._pending_close = True
+        if not self._pending_close:
+            return []
+        return self._parse(salvage=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        if self.done:
+            return []
+        rows = self._parse(salvage=True)
+        self.done = True
+        return rows
+
+    def _parse(self, salvage: bool) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        buffer = self._buffer
+        while not self.done:
+            if self._pos < 0 and not self._find_array(buffer):
+                break
+            pos = self._skip_separators(buffer, self._pos)
+            if pos >= len(buffer):
+                self._pos = pos
+                break
+            if buffer[pos] == "]":
+                if self._array_rows:
+                    self._pos = pos + 1
+                    self.done = True
+                    break
+                # An array that held no rows was not the dataset; look for the next one.
+                self._pos, self._search = -1, pos + 1
+                continue
+            try:
+                value, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not salvage:
+                    # Most likely an object that has not finished streaming yet.
+                    self._pos = pos
+                    break
+                self._pos = self._next_row(buffer, pos)
+                continue
+            if isinstance(value, dict):
+                rows.append(value)
+                self._array_rows += 1
+            self._pos = end
+
+        self._pending_close = False
+        return rows
+
+    def _find_array(self, buffer: str) -> bool:
+        # The row array is the first ``[`` followed by an object; wait for the character after
+        # a ``[`` before deciding.
+        while True:
+            start = buffer.find("[", self._search)
+            if start < 0:
+                self._search = len(buffer)
+                return False
+            first = start + 1
+            while first < len(buffer) and buffer[first].isspace():
+                first += 1
+            if first >= len(buffer):
+                self._search = start
+                return False
+            if buffer[first] == "{":
+                self._pos = first
+                self._array_rows = 0
+                return True
+            self._search = start + 1
+
+    @staticmethod
+    def _next_row(buffer: str, pos: int) -> int:
+        """
+        Return where the value after the broken one at ``pos`` starts in the row array.
+
+        Strings and nesting are tracked from ``pos``, which is directly inside the array, so
+        the result is the next ``{`` at that depth, the ``]`` closing the array, or the end
+        of the buffer.
+        """
+        depth = 1
+        in_string = escaped = False
+        for i in range(pos, len(buffer)):
+            char = buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                if depth == 1 and char == "{" and i > pos:
+                    return i
+                depth += 1
+            elif char in "}]":
+                if depth > 1:
+                    depth -= 1
+                elif char == "]":
+                    return i
+        return len(buffer)
+
+    @staticmethod
+    def _skip_separators(buffer: str, pos: int) -> int:
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+            pos += 1
+        return pos
+
+
+def parse_json_rows(chunks: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parse every complete row out of an iterable of text chunks."""
+    parser = JsonArrayStreamParser()
+    rows: List[Dict[str, Any]] = []
+    for chunk in chunks:
+        rows.extend(parser.feed(chunk))
+    rows.extend(parser.close())
+    return rows
@@ -204,12 +204,14 @@ Remember: The most important queries should come first in your list, as the syst
 RESULT_ACCUMULATOR_SYSTEM_PROMPT_TEMPLATE = """You are a specialized agent responsible for curating and synthesizing raw search results. Your task is to transform unstructured web content into coherent, relevant, and organized information that can be used for report generation.
 
 ## Input
-You will receive a list of SearchResult objects, each containing:
-1. A Query object with the search query that was used
-2. A list of raw_content strings containing text extracted from web pages
+You will receive:
+1. The content accumulated from earlier search rounds (empty on the first round)
+2. New search results, each listing the search query that was used followed by the raw content extracted from web pages
+
+Only the new search results have not been processed yet. Merge them into the accumulated content: keep every existing detail, add what is new, and consolidate what overlaps. Always return the complete updated content, not just the additions, and keep it under about {max_content_tokens} tokens.
 
 ## Process
-For each SearchResult provided:
+For each new search result provided:
 
 1. ANALYZE the raw_content to identify:
    - Key information relevant to the associated query
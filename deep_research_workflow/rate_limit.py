@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from .tracing import span
+
+
+class TokenBucket:
+    """
+    A token bucket that hands out reservations instead of rejecting callers.
+
+    ``reserve`` always succeeds: it takes ``amount`` from the bucket, letting the balance go
+    negative, and returns how long the caller has to wait before the balance is paid back.
+    Concurrent callers are therefore spaced out ahead of time rather than all firing at once
+    and finding out about the limit from a 429.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.burst_seconds = burst_seconds
+        # Providers quantize their limits over windows shorter than a minute, so only allow a
+        # burst of a few seconds' worth of budget rather than the whole minute up front.
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def set_rate(self, per_minute: float) -> None:
+        """Change the limit, keeping the reservations already made against the bucket."""
+        with self._lock:
+            self._refill()
+            self.per_minute = per_minute
+            self.rate = per_minute / 60.0
+            self.capacity = max(1.0, self.rate * self.burst_seconds)
+            self._tokens = min(self.capacity, self._tokens)
+
+
+class RateLimiter(BaseRateLimiter):
+    """
+    Requests-per-minute and tokens-per-minute limiter shared by every call to one service.
+
+    Chat models call ``acquire`` right before a live request (cache hits skip it). Token usage
+    is only known once the response arrives, so it is charged afterwards through
+    ``record_usage`` and delays the next request instead of the current one.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limits = (requests_per_minute, tokens_per_minute)
+        self.calls = 0
+        self.waited_calls = 0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            # Reserving nothing only waits for the usage already charged to be paid back.
+            wait = max(wait, self.tokens.reserve(0))
+        if wait > 0 and not blocking:
+            return False
+        if wait > 0:
+            with span("rate_limit_wait", wait_seconds=round(wait, 3)):
+                time.sleep(wait)
+        with self._lock:
+            self.calls += 1
+            if wait > 0:
+                self.waited_calls += 1
+                self.waited_seconds += wait
+        self._local.pending = True
+        self._local.acquired_at = time.perf_counter()
+        return True
+
+    def last_acquired_at(self) -> float:
+        """Return when this thread's last ``acquire`` returned, as a ``time.perf_counter`` value."""
+        return getattr(self._local, "acquired_at", 0.0)
+
+    def set_limits(self, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> None:
+        """Apply new limits to the service; 0 disables a limit."""
+        with self._lock:
+            if (requests_per_minute, tokens_per_minute) == self.limits:
+                return
+            self.limits = (requests_per_minute, tokens_per_minute)
+            self.requests = self._updated_bucket(self.requests, requests_per_minute)
+            self.tokens = self._updated_bucket(self.tokens, tokens_per_minute)
+
+    @staticmethod
+    def _updated_bucket(bucket: Optional[TokenBucket], per_minute: float) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        if bucket is None:
+            return TokenBucket(per_minute)
+        if bucket.per_minute != per_minute:
+            bucket.set_rate(per_minute)
+        return bucket
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return self.acquire(blocking=blocking)
+
+    def record_usage(self, total_tokens: int) -> None:
+        if not getattr(self._local, "pending", False):
+            return
+        self._local.pending = False
+        if self.tokens is not None and total_tokens:
+            self.tokens.reserve(total_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "waited_calls": self.waited_calls,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
+
+
+class RateLimitUsageHandler(BaseCallbackHandler):
+    """Charges the token usage reported by a finished chat completion to its ``RateLimiter``."""
+
+    run_inline = True
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        total = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    total += usage.get("total_tokens", 0)
+        self.limiter.record_usage(total)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> RateLimiter:
+    """
+    Return the process-wide limiter for ``name`` (a provider or search service).
+
+    There is one limiter per service because its limits apply to the whole account; when a
+    run asks for different limits than the limiter has, they replace the old ones, so the
+    most recent configuration is the one enforced.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = RateLimiter(name, requests_per_minute, tokens_per_minute)
+        else:
+            limiter.set_limits(requests_per_minute, tokens_per_minute)
+        return limiter
+
+
+def rate_limit_stats() -> list:
+    with _limiters_lock:
+        return [limiter.stats() for limiter in _limiters.values()]
@@ -0,0 +1,136 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from .search import analyze
+from .struct import Section, SearchResult
+from .utils import count_tokens
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def chunk_text(text: str, chunk_tokens: int = 200) -> List[str]:
+    """Split ``text`` into chunks of about ``chunk_tokens`` tokens, breaking between sentences."""
+    limit = chunk_tokens * 4
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > limit:
+            chunks.append(current)
+            current = ""
+        # A single overlong sentence (or a page without punctuation) is cut into pieces.
+        while len(sentence) > limit:
+            chunks.append(sentence[:limit])
+            sentence = sentence[limit:]
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def bm25_term_score(frequency: int, length: int, average_length: float, document_frequency: int,
+                    documents: int, k1: float = 1.5, b: float = 0.75) -> float:
+    """Okapi BM25 contribution of one query term to one document."""
+    idf = math.log(1 + (documents - document_frequency + 0.5) / (document_frequency + 0.5))
+    norm = k1 * (1 - b + b * length / (average_length or 1.0))
+    return idf * frequency * (k1 + 1) / (frequency + norm)
+
+
+class BM25Index:
+    """An in-memory inverted index that ranks documents for a query with Okapi BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+
+    def add(self, terms: Sequence[str]) -> int:
+        doc_id = len(self.lengths)
+        for term, frequency in Counter(terms).items():
+            self.postings[term].append((doc_id, frequency))
+        self.lengths.append(len(terms))
+        return doc_id
+
+    def scores(self, terms: Sequence[str]) -> Dict[int, float]:
+        if not self.lengths:
+            return {}
+        count = len(self.lengths)
+        average = sum(self.lengths) / count
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self.postings.get(term, ())
+            for doc_id, frequency in postings:
+                scores[doc_id] += bm25_term_score(frequency, self.lengths[doc_id], average, len(postings), count, self.k1, self.b)
+        return scores
+
+
+def section_queries(section: Section) -> List[str]:
+    """One retrieval query per sub-section, each prefixed with the section name."""
+    return [f"{section.section_name} {sub_section}" for sub_section in section.sub_sections] or [section.section_name]
+
+
+def select_relevant_chunks(
+        search_results: List[SearchResult],
+        queries: List[str],
+        token_budget: int,
+        top_k: int = 12,
+        chunk_tokens: int = 200,
+) -> List[SearchResult]:
+    """
+    Keep only the chunks of ``search_results`` that best match ``queries``.
+
+    The content is chunked and indexed, every query ranks the chunks, and the rankings are
+    taken in turns, so each sub-section gets its best chunks in before any gets a second.
+    Selection stops at ``top_k`` chunks or ``token_budget`` tokens. Chunks keep their
+    original order and query grouping. If nothing matches at all the results are returned
+    unchanged.
+    """
+    index = BM25Index()
+    chunks: List[Tuple[int, str]] = []
+    for result_index, result in enumerate(search_results):
+        for content in result.raw_content:
+            for chunk in chunk_text(content, chunk_tokens):
+                index.add(analyze(chunk))
+                chunks.append((result_index, chunk))
+
+    rankings = []
+    for query in queries:
+        scores = index.scores(analyze(query))
+        ranked = sorted((doc_id for doc_id, score in scores.items() if score > 0), key=lambda doc_id: -scores[doc_id])
+        if ranked:
+            rankings.append(iter(ranked))
+    if not rankings:
+        return search_results
+
+    selected = set()
+    used = 0
+    while rankings and len(selected) < top_k:
+        for ranking in list(rankings):
+            for doc_id in ranking:
+                if doc_id in selected:
+                    continue
+                size = count_tokens(chunks[doc_id][1])
+                if used + size > token_budget:
+                    continue
+                selected.add(doc_id)
+                used += size
+                break
+            else:
+                rankings.remove(ranking)
+            if len(selected) >= top_k:
+                break
+
+    kept: Dict[int, List[str]] = defaultdict(list)
+    for doc_id in sorted(selected):
+        result_index, chunk = chunks[doc_id]
+        kept[result_index].append(chunk)
+    return [
+        SearchResult(query=result.query, raw_content=kept[result_index])
+        for result_index, result in enumerate(search_results)
+        if kept[result_index]
+    ]
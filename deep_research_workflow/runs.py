@@ -0,0 +1,45 @@
+import json
+import os
+from typing import Any, Dict, List
+
+RUNS_DIR = os.path.join(".cache", "runs")
+
+# Graph nodes whose updates carry dataset rows.
+DATASET_NODES = ("research_agent", "batch_dataset_generator")
+
+
+def save_run(thread_id: str, record: Dict[str, Any], directory: str = RUNS_DIR) -> str:
+    """Persist the inputs and configuration a run was started with, so it can be resumed later."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{thread_id}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_run(thread_id: str, directory: str = RUNS_DIR) -> Dict[str, Any]:
+    """
+    Load the record written by ``save_run``.
+
+    Raises:
+        FileNotFoundError: If no run was started with ``thread_id``.
+    """
+    path = os.path.join(directory, f"{thread_id}.json")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No run found for thread id {thread_id!r} in {directory}.")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def interrupted_dataset_updates(snapshot) -> List[Dict[str, Any]]:
+    """
+    Return the updates of the dataset nodes that finished in the step a run was interrupted in.
+
+    ``snapshot`` is the run's ``StateSnapshot``. Those updates are checkpointed, but the state
+    keeps no rows, and resuming a step whose tasks had all finished does not stream them
+    again, so a resumed run writes them from here. Updates that are streamed again are
+    exact copies, which the caller drops as duplicates.
+    """
+    return [task.result for task in snapshot.tasks if task.name in DATASET_NODES and task.result]
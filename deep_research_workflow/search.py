@@ -0,0 +1,260 @@
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from .dedup import normalize_text
+
+T = TypeVar("T")
+
+
+def run_searches(
+        queries: Sequence[T],
+        search_fn: Callable[[T], List[str]],
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+) -> List[List[str]]:
+    """
+    Run ``search_fn`` for every query on a bounded thread pool.
+
+    Results are returned in the same order as ``queries``. A query that raises or does not
+    finish within its share of the batch deadline contributes an empty list, so one slow
+    or failing query never costs the section the rest of its results.
+
+    Args:
+        queries: The queries to search for.
+        search_fn: Callable returning the raw content strings for a single query.
+        max_concurrency: Upper bound on the number of searches in flight at once.
+        timeout: Per-query timeout in seconds.
+
+    Returns:
+        A list of raw content lists, aligned with ``queries``.
+    """
+    if not queries:
+        return []
+
+    workers = max(1, min(int(max_concurrency), len(queries)))
+    # Queries beyond the pool size wait for a free worker, so the batch deadline
+    # allows one timeout per "wave" of searches.
+    deadline = time.monotonic() + float(timeout) * math.ceil(len(queries) / workers)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+    try:
+        futures = [executor.submit(search_fn, query) for query in queries]
+        results = []
+        for query, future in zip(queries, futures):
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                print(f"[Search Timeout] {query} exceeded {timeout}s")
+                future.cancel()
+                results.append([])
+            except Exception as e:
+                print(f"[Search Error] {query}: {e}")
+                results.append([])
+        return results
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def gather_before_deadline(
+        calls: Dict[str, Callable[[], T]],
+        executor: Executor,
+        deadline: float,
+        timeout: float,
+) -> Dict[str, T]:
+    """
+    Run every call in ``calls`` concurrently and return the results of those done in time.
+
+    Calls still running ``deadline`` seconds in (0 waits for all of them) are left behind,
+    unless none has succeeded yet, in which case the first success within ``timeout`` is
+    taken. Calls that raise are reported and skipped; if every call fails, the last error is
+    raised.
+
+    Returns:
+        The results of the calls that finished in time, keyed like ``calls``.
+    """
+    started = time.monotonic()
+    # Each call runs in a copy of the caller's context, so tracing spans land on its lane.
+    futures = {executor.submit(contextvars.copy_context().run, call): name for name, call in calls.items()}
+    done, pending = wait(futures, timeout=(deadline or timeout) or None)
+    while pending and not any(future.exception() is None for future in done):
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        finished, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        done |= finished
+
+    results: Dict[str, T] = {}
+    error: Optional[BaseException] = None
+    for future, name in futures.items():
+        if future in pending:
+            print(f"[Search] {name} missed the {deadline or timeout}s deadline, continuing without it")
+            future.cancel()
+        elif future.exception() is not None:
+            error = future.exception()
+            print(f"[Search Error] {name}: {error}")
+        else:
+            results[name] = future.result()
+    if not results and error is not None:
+        raise error
+    return results
+
+
+def _result_keys(result: Dict[str, Any]) -> List[str]:
+    keys = [f"text:{normalize_text(result.get('content') or '')[:500]}"]
+    if result.get("url"):
+        parts = urlsplit(result["url"])
+        keys.append(f"url:{parts.netloc.lower().removeprefix('www.')}{parts.path.rstrip('/')}?{parts.query}")
+    return keys
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists into one with reciprocal rank fusion.
+
+    A result scores ``1 / (k + rank)`` in every list it appears in, so results several
+    backends agree on rise to the top without comparing their incompatible raw scores.
+    Results count as the same when their URLs match (ignoring scheme, ``www.`` and a
+    trailing slash) or their normalized text does; the longest copy of the content is kept.
+    """
+    merged: List[Dict[str, Any]] = []
+    scores: List[float] = []
+    seen: Dict[str, int] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            keys = _result_keys(result)
+            index = next((seen[key] for key in keys if key in seen), None)
+            if index is None:
+                index = len(merged)
+                merged.append(dict(result))
+                scores.append(0.0)
+            elif len(result.get("content") or "") > len(merged[index].get("content") or ""):
+                merged[index] = {**merged[index], "content": result["content"]}
+            scores[index] += 1.0 / (k + rank)
+            for key in keys:
+                seen.setdefault(key, index)
+    order = sorted(range(len(merged)), key=lambda index: -scores[index])
+    return [merged[index] for index in order]
+
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or the to what when where which who why with vs versus".split()
+)
+
+
+def analyze(text: str) -> List[str]:
+    """Split ``text`` into its content words, lower-cased, without stopwords or plural endings."""
+    terms = []
+    for word in normalize_text(text).split():
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "is", "us")):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """Normalize a search query to its set of content words, ignoring order, case and plurals."""
+    return frozenset(analyze(query))
+
+
+class _RegisteredQuery:
+    def __init__(self, query: str, terms: FrozenSet[str]):
+        self.query = query
+        self.terms = terms
+        self.future: Future = Future()
+
+
+class QueryRegistry:
+    """
+    Run-wide registry that lets parallel sections share searches.
+
+    Queries are normalized to their content words and clustered by Jaccard similarity, so
+    "photosynthesis light reactions" and "light reaction in photosynthesis" count as one
+    search. The first section to ask owns the search; every other section asking for the
+    same or a near-identical query, while it is in flight or afterwards, receives its results.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.8):
+        self.similarity_threshold = similarity_threshold
+        self.searches = 0
+        self.reused = 0
+        self._entries: Dict[Tuple, Dict[FrozenSet[str], _RegisteredQuery]] = {}
+        self._by_term: Dict[Tuple, Dict[str, List[_RegisteredQuery]]] = {}
+        self._lock = threading.Lock()
+
+    def _find(self, params_key: Tuple, terms: FrozenSet[str]):
+        exact = self._entries.get(params_key, {}).get(terms)
+        if exact is not None or not terms:
+            return exact
+        candidates = {
+            id(entry): entry
+            for term in terms
+            for entry in self._by_term.get(params_key, {}).get(term, ())
+        }
+        best, best_score = None, self.similarity_threshold
+        for entry in candidates.values():
+            score = len(terms & entry.terms) / len(terms | entry.terms)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _remove(self, params_key: Tuple, entry: _RegisteredQuery) -> None:
+        self._entries.get(params_key, {}).pop(entry.terms, None)
+        for term in entry.terms:
+            entries = self._by_term.get(params_key, {}).get(term, [])
+            if entry in entries:
+                entries.remove(entry)
+
+    def search(self, query: str, params: Dict[str, Any], search_fn: Callable[[], List[str]], timeout: float) -> List[str]:
+        """Return the results for ``query``, running ``search_fn`` only if no similar query was searched."""
+        params_key = tuple(sorted(params.items()))
+        terms = query_terms(query)
+        with self._lock:
+            entry = self._find(params_key, terms)
+            owner = entry is None
+            if owner:
+                entry = _RegisteredQuery(query, terms)
+                self._entries.setdefault(params_key, {})[terms] = entry
+                for term in terms:
+                    self._by_term.setdefault(params_key, {}).setdefault(term, []).append(entry)
+                self.searches += 1
+            else:
+                self.reused += 1
+
+        if not owner:
+            return entry.future.result(timeout=timeout)
+
+        try:
+            results = search_fn()
+        except Exception as e:
+            # Let a later request retry the search instead of replaying the failure.
+            with self._lock:
+                self._remove(params_key, entry)
+            entry.future.set_exception(e)
+            raise
+        entry.future.set_result(results)
+        return results
+
+
+_registries: "OrderedDict[str, QueryRegistry]" = OrderedDict()
+_registries_lock = threading.Lock()
+_MAX_TRACKED_RUNS = 32
+
+
+def get_query_registry(thread_id: str, similarity_threshold: float = 0.8) -> QueryRegistry:
+    """Return the registry shared by every section of the run ``thread_id``."""
+    with _registries_lock:
+        registry = _registries.get(thread_id)
+        if registry is None:
+            registry = _registries[thread_id] = QueryRegistry(similarity_threshold)
+            while len(_registries) > _MAX_TRACKED_RUNS:
+                _registries.popitem(last=False)
+        _registries.move_to_end(thread_id)
+        return registry
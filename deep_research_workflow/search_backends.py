@@ -0,0 +1,320 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Tuple
+
+from .retrieval import bm25_term_score, chunk_text
+from .search import analyze
+from .tracing import tracer
+
+# A search result is a dict with at least "url", "title" and "content"; backends may add
+# their own fields, such as a relevance "score".
+
+
+class SearchBackend(ABC):
+    """
+    Answers a search query with a ranked list of results.
+
+    ``remote`` backends call a paid or rate-limited service, so the search node puts them
+    behind the search cache and rate limiter; local ones are queried directly.
+    """
+
+    name = ""
+    remote = True
+
+    @abstractmethod
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, Any]]:
+        ...
+
+
+class TavilySearchBackend(SearchBackend):
+    """Web search through the Tavily API."""
+
+    name = "tavily"
+
+    def __init__(self, client):
+        self.client = client
+
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, Any]]:
+        response = self.client.search(query=query, max_results=max_results, include_raw_content=True, timeout=timeout)
+        return response["results"]
+
+
+class _TextExtractor(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title = ""
+        self._skipping = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in ("p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"):
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._skipping:
+            return
+        if self._in_title:
+            self.title += data
+        else:
+            self.parts.append(data)
+
+
+def read_document(path: str) -> Tuple[str, str]:
+    """Return ``(title, text)`` for a text, Markdown or HTML file."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    title = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith((".html", ".htm")):
+        extractor = _TextExtractor()
+        extractor.feed(raw)
+        extractor.close()
+        return extractor.title.strip() or title, "".join(extractor.parts)
+    for line in raw.splitlines():
+        if line.startswith("# "):
+            return line[2:].strip(), raw
+        if line.strip():
+            break
+    return title, raw
+
+
+class LocalCorpusIndex:
+    """
+    A persistent BM25 index over the text, Markdown and HTML files under a directory.
+
+    Files are split into chunks and stored with their postings in SQLite, so the index
+    survives between runs. ``refresh`` walks the directory, drops files that were deleted and
+    only re-indexes files whose content changed: files with the same size and modification
+    time are skipped, and the rest are hashed and compared with the stored SHA-256, so a
+    ``touch`` or a fresh checkout of the same corpus does not re-index it.
+    """
+
+    EXTENSIONS = (".txt", ".md", ".markdown", ".html", ".htm")
+
+    def __init__(self, corpus_dir: str, path: str, chunk_tokens: int = 200):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.corpus_dir = os.path.abspath(corpus_dir)
+        self.path = path
+        self.chunk_tokens = chunk_tokens
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL DEFAULT '',
+                title TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                frequency INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);
+            CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+            CREATE INDEX IF NOT EXISTS postings_chunk_id ON postings (chunk_id);
+            """
+        )
+        # Indexes written before content hashes were stored get an empty hash, so their
+        # files are re-indexed once on the next refresh.
+        if "sha256" not in {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}:
+            self._conn.execute("ALTER TABLE files ADD COLUMN sha256 TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for root, _, names in os.walk(self.corpus_dir):
+            for name in names:
+                if name.lower().endswith(self.EXTENSIONS):
+                    path = os.path.join(root, name)
+                    found[path] = os.stat(path)
+        return found
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _remove(self, path: str) -> None:
+        self._conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE path = ?)", (path,))
+        self._conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _add(self, path: str, stat: os.stat_result, sha256: str) -> None:
+        title, text = read_document(path)
+        self._conn.execute(
+            "INSERT INTO files (path, mtime_ns, size, sha256, title) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, sha256, title),
+        )
+        for position, chunk in enumerate(chunk_text(text, self.chunk_tokens)):
+            terms = analyze(chunk)
+            cursor = self._conn.execute(
+                "INSERT INTO chunks (path, position, content, length) VALUES (?, ?, ?, ?)",
+                (path, position, chunk, len(terms)),
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (term, chunk_id, frequency) VALUES (?, ?, ?)",
+                [(term, cursor.lastrowid, frequency) for term, frequency in Counter(terms).items()],
+            )
+
+    def refresh(self) -> Dict[str, int]:
+        """Bring the index up to date with the directory and return how many files changed."""
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        found = self._walk()
+        with self._lock:
+            indexed = {
+                path: (mtime_ns, size, sha256)
+                for path, mtime_ns, size, sha256 in self._conn.execute("SELECT path, mtime_ns, size, sha256 FROM files")
+            }
+            for path in indexed.keys() - found.keys():
+                self._remove(path)
+                counts["removed"] += 1
+            for path, stat in found.items():
+                if indexed.get(path, ())[:2] == (stat.st_mtime_ns, stat.st_size):
+                    counts["unchanged"] += 1
+                    continue
+                sha256 = self._digest(path)
+                if path in indexed and indexed[path][2] == sha256:
+                    # Same content with a new timestamp: remember the new stat and keep the chunks.
+                    self._conn.execute(
+                        "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?", (stat.st_mtime_ns, stat.st_size, path)
+                    )
+                    counts["unchanged"] += 1
+                    continue
+                if path in indexed:
+                    self._remove(path)
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+                self._add(path, stat, sha256)
+            self._conn.commit()
+        return counts
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        terms = set(analyze(query))
+        if not terms:
+            return []
+        with self._lock:
+            documents, average = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not documents:
+                return []
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                # Lengths are joined in rather than looked up with an ``IN (...)`` list, which a
+                # common term could push past SQLite's limit on query parameters.
+                matches = self._conn.execute(
+                    "SELECT p.chunk_id, p.frequency, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                for chunk_id, frequency, length in matches:
+                    scores[chunk_id] += bm25_term_score(frequency, length, average, len(matches), documents)
+            best = sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:max_results]
+
+            results = []
+            for chunk_id in best:
+                path, content, title = self._conn.execute(
+                    "SELECT chunks.path, chunks.content, files.title FROM chunks JOIN files ON files.path = chunks.path WHERE chunks.id = ?",
+                    (chunk_id,),
+                ).fetchone()
+                results.append({"url": f"file://{path}", "title": title, "content": content, "score": round(scores[chunk_id], 4)})
+            return results
+
+
+class LocalCorpusSearchBackend(SearchBackend):
+    """Offline search over a local directory of documents, with no network and no per-query cost."""
+
+    name = "local"
+    remote = False
+
+    def __init__(self, index: LocalCorpusIndex):
+        self.index = index
+
+    def search(self, query: str, max_results: int, timeout: float) -> List[Dict[str, Any]]:
+        return self.index.search(query, max_results)
+
+
+_corpus_indexes: Dict[Tuple[str, str], LocalCorpusIndex] = {}
+_corpus_lock = threading.Lock()
+
+
+def get_corpus_index(corpus_dir: str, path: str) -> LocalCorpusIndex:
+    """
+    Return the process-wide index of ``corpus_dir`` stored at ``path``.
+
+    The index is refreshed once, when it is first opened in a process, so files added or
+    edited between runs are picked up without re-indexing the rest of the corpus. The refresh
+    is recorded as a ``corpus_refresh`` trace span with the number of files added, updated,
+    removed and unchanged.
+    """
+    if not corpus_dir or not os.path.isdir(corpus_dir):
+        raise ValueError(f"The local search backend needs LOCAL_CORPUS_DIR set to a directory, got {corpus_dir!r}")
+    key = (os.path.abspath(corpus_dir), os.path.abspath(path))
+    with _corpus_lock:
+        index = _corpus_indexes.get(key)
+        if index is None:
+            index = LocalCorpusIndex(corpus_dir, path)
+            started = time.perf_counter()
+            counts = index.refresh()
+            tracer.add_span("corpus_refresh", started, time.perf_counter(), corpus_dir=key[0], **counts)
+            _corpus_indexes[key] = index
+        return index
+
+
+def _local_backend(configuration) -> SearchBackend:
+    path = configuration.local_corpus_index_path or os.path.join(configuration.cache_dir, "corpus.sqlite")
+    return LocalCorpusSearchBackend(get_corpus_index(configuration.local_corpus_dir, path))
+
+
+def _tavily_backend(configuration) -> SearchBackend:
+    from .clients import get_search_client
+    return TavilySearchBackend(get_search_client())
+
+
+# Factories take the run's Configuration and return a ready backend.
+SEARCH_BACKENDS: Dict[str, Callable[[Any], SearchBackend]] = {
+    "tavily": _tavily_backend,
+    "local": _local_backend,
+}
+
+
+def register_search_backend(name: str, factory: Callable[[Any], SearchBackend]) -> None:
+    SEARCH_BACKENDS[name] = factory
+
+
+def get_search_backend(name: str, configuration) -> SearchBackend:
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend {name!r}. Expected one of: {', '.join(SEARCH_BACKENDS)}.")
+    return SEARCH_BACKENDS[name](configuration)
@@ -5,14 +5,22 @@ from typing import TypedDict
 from .struct import Section, Feedback, Query, SearchResult, DatasetSchema
 
 
+def _streamed_rows(rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Dataset rows reach the caller through each node's update and are written to disk from
+    # there, so the run state does not hold on to them and checkpoints stay the same size
+    # however large the dataset grows.
+    return []
+
+
 class AgentState(TypedDict):
     topic: str
     outline: str
     messages: Annotated[List[BaseMessage], operator.add]
     report_structure: str
     sections: List[Section]
-    final_section_dataset: Annotated[List[Dict[str, Any]], operator.add] = []
-    final_dataset: List[Dict[str, Any]]
+    final_section_dataset: Annotated[List[Dict[str, Any]], _streamed_rows] = []
+    section_stats: Annotated[List[Dict[str, Any]], operator.add] = []
+    batch_requests: Annotated[List[Dict[str, Any]], operator.add] = []
     schema: DatasetSchema
 
 class ResearchState(TypedDict):
@@ -25,8 +33,11 @@ class ResearchState(TypedDict):
     searched_queries: Annotated[List[Query], operator.add] = []
     search_results: Annotated[List[SearchResult], operator.add] = []
     accumulated_content: str = ""
+    accumulated_results_count: int = 0
     reflection_count: int = 1
     final_section_content: List[str] = []
     schema: DatasetSchema
     final_section_dataset: List[Dict[str, Any]] = []
+    section_stats: List[Dict[str, Any]] = []
+    batch_requests: List[Dict[str, Any]] = []
     error: str
\ No newline at end of file
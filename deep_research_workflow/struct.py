@@ -44,3 +44,5 @@ class Feedback(BaseModel):
 class SectionOutput(BaseModel):
     # final_section_content: List[str] = Field(..., description="The final section content")
     final_section_dataset: List[Dict[str, Any]] = Field(..., description="The final section dataset")
+    section_stats: List[Dict[str, Any]] = Field(default_factory=list, description="The section name and number of rows it contributed")
+    batch_requests: List[Dict[str, Any]] = Field(default_factory=list, description="Dataset generation requests deferred to a batch job")
@@ -0,0 +1,184 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# (run id, section, concurrent) of the innermost open span on the current thread or task.
+_current_scope: contextvars.ContextVar[Tuple[str, str, bool]] = contextvars.ContextVar("trace_scope", default=("", "", False))
+
+
+class Tracer:
+    """
+    Collects nested spans in memory and exports them in the Chrome trace event format.
+
+    Each run becomes a trace "process" and each section a "thread", with the run-level nodes
+    on a lane of their own. Spans on a lane nest by time, so a section shows its
+    ``research_agent`` span, the nodes inside it and the LLM and search calls inside those.
+    Concurrent searches get one lane per worker thread. When disabled, ``span`` returns a
+    shared no-op context manager and nothing is recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._sections: Dict[Tuple[str, str], List[float]] = {}
+        self._pids: Dict[str, int] = {}
+        self._lanes: Dict[Tuple[str, str, Optional[int]], int] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, path: str) -> None:
+        self.enabled = True
+        self.path = path
+
+    def _ids(self, run: str, section: str, thread: Optional[int]) -> Tuple[int, int]:
+        pid = self._pids.setdefault(run, len(self._pids) + 1)
+        tid = self._lanes.setdefault((run, section, thread), len(self._lanes) + 1)
+        return pid, tid
+
+    def add_span(self, name: str, start: float, end: float, run: str = "", section: str = "",
+                 concurrent: bool = False, **attrs: Any) -> None:
+        if not self.enabled:
+            return
+        thread = threading.get_ident() if concurrent else None
+        with self._lock:
+            pid, tid = self._ids(run, section, thread)
+            self._events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {"section": section, **attrs} if section else attrs,
+            })
+            if section and not concurrent:
+                bounds = self._sections.setdefault((run, section), [start, end])
+                bounds[0], bounds[1] = min(bounds[0], start), max(bounds[1], end)
+
+    @contextmanager
+    def _span(self, name: str, run: Optional[str], section: Optional[str], concurrent: Optional[bool], attrs: Dict[str, Any]):
+        parent_run, parent_section, parent_concurrent = _current_scope.get()
+        run = parent_run if run is None else run
+        section = parent_section if section is None else section
+        concurrent = parent_concurrent if concurrent is None else concurrent
+        token = _current_scope.set((run, section, concurrent))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _current_scope.reset(token)
+            self.add_span(name, start, time.perf_counter(), run, section, concurrent, **attrs)
+
+    def span(self, name: str, run: Optional[str] = None, section: Optional[str] = None,
+             concurrent: Optional[bool] = None, **attrs: Any):
+        """
+        Time the enclosed block as a span named ``name``.
+
+        ``run`` and ``section`` default to those of the enclosing span. Pass ``concurrent=True``
+        for work running on a worker thread so it gets a lane of its own; spans opened inside
+        it inherit that lane.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return self._span(name, run, section, concurrent, attrs)
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.path
+        if not self.enabled or not path:
+            return None
+        with self._lock:
+            events = list(self._events)
+            # A section's research_agent span covers everything recorded on its lane.
+            for (run, section), (start, end) in self._sections.items():
+                pid, tid = self._ids(run, section, None)
+                events.append({
+                    "name": "research_agent", "ph": "X", "pid": pid, "tid": tid,
+                    "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6,
+                    "args": {"section": section},
+                })
+            for run, pid in self._pids.items():
+                events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"run {run}"}})
+            workers: Dict[Tuple[str, str], int] = {}
+            for (run, section, thread), tid in self._lanes.items():
+                label = section or "run"
+                if thread is not None:
+                    workers[run, section] = workers.get((run, section), 0) + 1
+                    label = f"{label} / worker {workers[run, section]}"
+                events.append({"name": "thread_name", "ph": "M", "pid": self._pids[run], "tid": tid, "args": {"name": label}})
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+tracer = Tracer()
+span = tracer.span
+
+
+def traced_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node so each execution is recorded as a span with its section and loop count."""
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        if not tracer.enabled:
+            return node(state, config)
+        section = state.get("section")
+        attrs = {"reflection_count": state.get("reflection_count", 0)} if section is not None else {}
+        with tracer.span(
+            name,
+            run=str((config or {}).get("configurable", {}).get("thread_id", "")),
+            section=section.section_name if section is not None else "",
+            **attrs,
+        ):
+            return node(state, config)
+
+    return wrapper
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records every chat completion as a span nested inside the node that made it."""
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started: Dict[UUID, Tuple[float, Tuple[str, str, bool]]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = (time.perf_counter(), _current_scope.get())
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = (time.perf_counter(), _current_scope.get())
+
+    def _finish(self, run_id: UUID, **attrs: Any) -> None:
+        start, (run, section, concurrent) = self._started.pop(run_id, (time.perf_counter(), _current_scope.get()))
+        tracer.add_span("llm", start, time.perf_counter(), run, section, concurrent, model=self.model, **attrs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, error=str(error))
@@ -1,8 +1,4 @@
 from typing import Literal, List
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama import ChatOllama
 import os
 import json
 from dotenv import load_dotenv
@@ -21,7 +17,8 @@ def init_llm(
 
     This function creates a chat interface for different LLM providers including OpenAI, 
     Anthropic, Google, and Ollama. It handles API key validation and configuration for
-    each provider.
+    each provider. Provider packages are imported on first use, so only the chosen
+    provider's SDK is ever loaded.
 
     Args:
         provider: The LLM provider to use. Must be one of "openai", "anthropic", "google", or "ollama".
@@ -33,26 +30,58 @@ def init_llm(
         A configured chat interface for the specified provider and model.
 
     Raises:
-        ValueError: If the required API key environment variable is not set for the chosen provider
-                   (except for Ollama which runs locally).
+        ValueError: If the provider is unknown or the required API key environment variable is not
+                   set for the chosen provider (except for Ollama which runs locally).
     """
     if provider == "openai":
         if "OPENAI_API_KEY" not in os.environ:
             raise ValueError("OPENAI_API_KEY is not set. Please set it in your environment variables.")
-        return ChatOpenAI(model=model, temperature=temperature, api_key=os.environ["OPENAI_API_KEY"])
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, temperature=temperature, api_key=os.environ["OPENAI_API_KEY"], stream_usage=True)
     elif provider == "anthropic":
         if "ANTHROPIC_API_KEY" not in os.environ:
             raise ValueError("ANTHROPIC_API_KEY is not set. Please set it in your environment variables.")
+        from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(model=model, temperature=temperature, api_key=os.environ["ANTHROPIC_API_KEY"])
     elif provider == "google":
         if "GOOGLE_API_KEY" not in os.environ:
             raise ValueError("GOOGLE_API_KEY is not set. Please set it in your environment variables.")
+        from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(model=model, temperature=temperature, api_key=os.environ["GOOGLE_API_KEY"])
     elif provider == "ollama":
+        from langchain_ollama import ChatOllama
         return ChatOllama(model=model, temperature=temperature)
+    raise ValueError(f"Unknown provider {provider!r}. Expected one of: openai, anthropic, google, ollama.")
 
 
 
+def count_tokens(text: str) -> int:
+    # A provider-independent estimate; roughly four characters per token for English text.
+    return (len(text) + 3) // 4
+
+
+def fit_to_token_budget(texts: List[str], budget: int) -> List[str]:
+    """
+    Truncate ``texts`` so that together they fit in ``budget`` tokens.
+
+    The budget is shared fairly: texts shorter than an equal share are kept whole and the
+    tokens they leave unused go to the longer ones, which are cut at the end.
+    """
+    sizes = [count_tokens(text) for text in texts]
+    if sum(sizes) <= budget:
+        return list(texts)
+
+    allowance = [0] * len(texts)
+    remaining = budget
+    pending = sorted(range(len(texts)), key=lambda i: sizes[i])
+    while pending:
+        share = remaining // len(pending)
+        index = pending.pop(0)
+        allowance[index] = min(sizes[index], share)
+        remaining -= allowance[index]
+    return [text[:allowance[i] * 4] for i, text in enumerate(texts)]
+
+
 def process_datagen_prompt(fields: List[SchemaField], rows: int = 10) -> str:
     schema_instruction = {field.key: field.description for field in fields}
 
@@ -77,4 +106,23 @@ You are an expert Question-Answer generation assistant who has the skills of a p
 4. Number of dataset rows must be {rows}
 
 {field_string}
-"""
\ No newline at end of file
+"""
+
+
+def process_row_repair_prompt(fields: List[SchemaField]) -> str:
+    schema_instruction = {field.key: f"{field.type.value} - {field.description}" for field in fields}
+
+    return f"""
+You are a data cleaning assistant. The user will send dataset rows that failed validation together with the validation errors for each row.
+
+## Instructions
+
+1. Fix every row so that it has exactly the keys below with values of the stated type (string, number, array or boolean).
+
+2. Keep the meaning and content of each row; only change what is needed to fix the errors.
+
+3. Respond with a valid JSON array containing the corrected rows in the same order, and nothing else.
+
+## Row Format
+{json.dumps(schema_instruction, indent=2)}
+"""
@@ -0,0 +1,86 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Type, Union
+
+from pydantic import BaseModel, ConfigDict, Field, StrictBool, StrictFloat, StrictInt, StrictStr, ValidationError, create_model
+
+from .struct import DatasetSchema, FieldType
+
+_STRICT_TYPES = {
+    FieldType.string: StrictStr,
+    FieldType.number: Union[StrictInt, StrictFloat],
+    FieldType.array: List[Any],
+    FieldType.boolean: StrictBool,
+}
+
+_LAX_TYPES = {
+    FieldType.string: str,
+    FieldType.number: Union[int, float],
+    FieldType.array: List[Any],
+    FieldType.boolean: bool,
+}
+
+SchemaKey = Tuple[Tuple[str, FieldType], ...]
+
+
+@lru_cache(maxsize=64)
+def _build_row_model(fields: SchemaKey, strict: bool) -> Type[BaseModel]:
+    types = _STRICT_TYPES if strict else _LAX_TYPES
+    # Schema keys are free-form text, so fields get safe names and keep the key as alias.
+    definitions = {
+        f"field_{index}": (types[FieldType(field_type)], Field(..., alias=key))
+        for index, (key, field_type) in enumerate(fields)
+    }
+    return create_model(
+        "DatasetRow" if strict else "LaxDatasetRow",
+        __config__=ConfigDict(extra="ignore", populate_by_name=False),
+        **definitions,
+    )
+
+
+def _schema_key(schema: DatasetSchema) -> SchemaKey:
+    return tuple((field.key, field.type) for field in schema.generated_schema)
+
+
+def row_model_for(schema: DatasetSchema, strict: bool = True) -> Type[BaseModel]:
+    """Return the typed row model for ``schema``, compiled once and reused for every row."""
+    return _build_row_model(_schema_key(schema), strict)
+
+
+def format_errors(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+
+def validate_rows(
+        rows: List[Any],
+        schema: DatasetSchema,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate dataset rows one by one against ``schema``.
+
+    Rows are first checked strictly, so a string where ``FieldType.number`` is expected
+    fails. A failing row that converts cleanly under lax validation (for example ``"3"`` to
+    ``3``) is repaired locally. Keys outside the schema are dropped.
+
+    Returns:
+        ``(valid, invalid)`` where ``valid`` holds the cleaned rows and ``invalid`` holds
+        ``{"row": ..., "errors": [...]}`` entries for rows that need a model-side repair.
+    """
+    strict_model = row_model_for(schema, strict=True)
+    lax_model = row_model_for(schema, strict=False)
+
+    valid: List[Dict[str, Any]] = []
+    invalid: List[Dict[str, Any]] = []
+    for row in rows:
+        if not isinstance(row, dict):
+            invalid.append({"row": row, "errors": ["row: Input should be a JSON object"]})
+            continue
+        try:
+            valid.append(strict_model.model_validate(row).model_dump(by_alias=True))
+            continue
+        except ValidationError as e:
+            errors = format_errors(e)
+        try:
+            valid.append(lax_model.model_validate(row).model_dump(by_alias=True))
+        except ValidationError:
+            invalid.append({"row": row, "errors": errors})
+    return valid, invalid
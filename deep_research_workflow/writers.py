@@ -0,0 +1,446 @@
+import csv
+import gzip
+import io
+import json
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .struct import DatasetSchema, FieldType
+
+# File name suffix added by each compression; formats with their own codecs (Parquet, Arrow)
+# keep their usual extension.
+COMPRESSION_SUFFIXES = {"": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _normalize_compression(compression: Optional[str]) -> str:
+    compression = (compression or "").strip().lower()
+    compression = "" if compression == "none" else compression
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression {compression!r}. Expected one of: none, gzip, zstd.")
+    return compression
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs the zstandard package: pip install zstandard") from None
+    return zstandard
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need the pyarrow package: pip install pyarrow") from None
+    return pyarrow
+
+
+def schema_columns(schema: Optional[DatasetSchema], rows: List[Dict[str, Any]]) -> List[Tuple[str, FieldType]]:
+    """
+    Return ``(key, type)`` for every column, from ``schema`` or, failing that, from ``rows``.
+
+    Inferred columns follow the keys of the first row, typed from its values the same way
+    the schema generator would describe them.
+    """
+    if schema is not None and schema.generated_schema:
+        return [(field.key, field.type) for field in schema.generated_schema]
+    columns = []
+    for key, value in (rows[0] if rows else {}).items():
+        if isinstance(value, bool):
+            columns.append((key, FieldType.boolean))
+        elif isinstance(value, (int, float)):
+            columns.append((key, FieldType.number))
+        elif isinstance(value, list):
+            columns.append((key, FieldType.array))
+        else:
+            columns.append((key, FieldType.string))
+    return columns
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+class DatasetWriter(ABC):
+    """
+    Streams dataset rows to ``path`` as sections finish.
+
+    Rows are written to ``<path>.part`` in batches (one per ``write_rows`` call). ``close``
+    moves the file into place atomically, which means ``path`` only ever exists once the run
+    has finished, and ``abort`` stops writing while keeping the rows written so far.
+
+    With ``resume``, the rows an interrupted run left in ``.part`` (or in ``path``) are read
+    back into ``resumed_rows`` and written again at the start of the new ``.part`` file. The
+    old file is kept as ``.part.resume`` until they are safely on disk, so a second crash
+    while resuming loses nothing. Subclasses implement ``_open``, ``_write``, ``_close`` and
+    ``_read``.
+    """
+
+    extension = ""
+    # Whether every ``write_rows`` batch is readable on disk as soon as it returns.
+    synced_per_batch = True
+
+    def __init__(self, path: str, schema: Optional[DatasetSchema] = None, resume: bool = False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.part_path = f"{path}.part"
+        # May be set later, e.g. once the run's schema is generated, until the first rows arrive.
+        self.schema = schema
+        self.rows_written = 0
+        self.closed = False
+        self.resumed_rows: List[Dict[str, Any]] = []
+        self._resume_path = f"{self.part_path}.resume" if resume else None
+        if resume:
+            self.resumed_rows = self._recover()
+        self._open()
+        self.write_rows(self.resumed_rows)
+        if self.synced_per_batch:
+            self._drop_resume_file()
+
+    def _recover(self) -> List[Dict[str, Any]]:
+        # A ``.part.resume`` file left by an earlier attempt still holds every recovered row,
+        # while the ``.part`` next to it may be an unfinished rewrite of them.
+        if not os.path.exists(self._resume_path):
+            source = next((path for path in (self.part_path, self.path) if os.path.exists(path)), None)
+            if source is None:
+                return []
+            os.replace(source, self._resume_path)
+        return self._read(self._resume_path)
+
+    def _drop_resume_file(self) -> None:
+        if self._resume_path and os.path.exists(self._resume_path):
+            os.remove(self._resume_path)
+
+    @property
+    def base_path(self) -> str:
+        """``path`` without its format and compression extensions, for files written alongside it."""
+        base = self.path
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if suffix and base.endswith(suffix):
+                base = base[:-len(suffix)]
+        return base[:-len(self.extension)] if self.extension and base.endswith(self.extension) else os.path.splitext(base)[0]
+
+    @abstractmethod
+    def _open(self) -> None:
+        ...
+
+    @abstractmethod
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def _close(self) -> None:
+        ...
+
+    @abstractmethod
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        """Return the rows in ``path``, a file this writer was writing when it was interrupted."""
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        rows = list(rows)
+        if rows:
+            self._write(rows)
+            self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self) -> str:
+        if not self.closed:
+            self.closed = True
+            self._close()
+            os.replace(self.part_path, self.path)
+            self._drop_resume_file()
+        return self.path
+
+    def abort(self) -> str:
+        """Stop writing without finalizing, keeping the rows written so far in ``part_path``."""
+        if not self.closed:
+            self.closed = True
+            self._close()
+            self._drop_resume_file()
+        return self.part_path
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Only a successful run is finalized; otherwise the ``.part`` file is left behind
+        # with the rows written so far.
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _TextDatasetWriter(DatasetWriter):
+    """
+    A line-oriented writer with optional gzip or zstd compression.
+
+    Every batch is flushed through the compressor and synced to disk, so a crash keeps every
+    completed section's rows readable, compressed or not.
+    """
+
+    def __init__(self, path: str, schema: Optional[DatasetSchema] = None, compression: Optional[str] = None,
+                 resume: bool = False):
+        self.compression = _normalize_compression(compression)
+        super().__init__(path, schema, resume)
+
+    def _read_text(self, path: str) -> str:
+        with open(path, "rb") as f:
+            data = f.read()
+        # Decompressing incrementally accepts a stream the crash cut off after its last flush.
+        if self.compression == "gzip":
+            data = zlib.decompressobj(31).decompress(data)
+        elif self.compression == "zstd":
+            data = _zstandard().ZstdDecompressor().decompressobj().decompress(data)
+        text = data.decode("utf-8", errors="replace")
+        # Only complete lines count; the last one may have been cut short.
+        return text[:text.rfind("\n") + 1]
+
+    def _open(self) -> None:
+        self._raw = open(self.part_path, "wb")
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            self._stream = _zstandard().ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._file = io.TextIOWrapper(self._stream, encoding="utf-8", newline="", write_through=True)
+
+    def _flush(self) -> None:
+        self._file.flush()
+        if self._stream is not self._raw:
+            # gzip flushes with Z_SYNC_FLUSH and zstd ends the current block, so everything
+            # written so far can be decompressed.
+            self._stream.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _close(self) -> None:
+        self._file.flush()
+        self._file.detach()
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+
+
+class JsonlDatasetWriter(_TextDatasetWriter):
+    """Writes one JSON object per line."""
+
+    extension = ".jsonl"
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False))
+            self._file.write("\n")
+        self._flush()
+
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        rows = []
+        for line in self._read_text(path).splitlines():
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(row, dict):
+                rows.append(row)
+        return rows
+
+
+class CsvDatasetWriter(_TextDatasetWriter):
+    """
+    Writes CSV with a header row.
+
+    Columns follow the schema (or the first batch's keys); array values are written as JSON.
+    """
+
+    extension = ".csv"
+
+    def _open(self) -> None:
+        super()._open()
+        self._writer = None
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if self._writer is None:
+            keys = [key for key, _ in schema_columns(self.schema, rows)]
+            self._writer = csv.DictWriter(self._file, fieldnames=keys, extrasaction="ignore")
+            self._writer.writeheader()
+        for row in rows:
+            self._writer.writerow({key: _text(value) for key, value in row.items()})
+        self._flush()
+
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        types = dict(schema_columns(self.schema, []))
+        rows = []
+        for row in csv.DictReader(io.StringIO(self._read_text(path), newline="")):
+            for key, value in row.items():
+                # Non-string columns were written as JSON, e.g. numbers, booleans and arrays.
+                if types.get(key, FieldType.string) != FieldType.string:
+                    try:
+                        row[key] = json.loads(value) if value else None
+                    except json.JSONDecodeError:
+                        pass
+            rows.append(row)
+        return rows
+
+
+class _ArrowDatasetWriter(DatasetWriter):
+    """
+    Writes typed columns with pyarrow, one record batch per ``write_rows`` call.
+
+    Column types come from the schema's ``FieldType``: strings, float64 numbers, booleans
+    and arrays as lists of strings (non-string items are JSON-encoded). The file's footer is
+    only written when the writer is closed or aborted, so unlike the text formats a hard
+    crash leaves a ``.part`` file that cannot be read.
+    """
+
+    synced_per_batch = False
+
+    def __init__(self, path: str, schema: Optional[DatasetSchema] = None, compression: Optional[str] = None,
+                 resume: bool = False):
+        self.compression = _normalize_compression(compression)
+        super().__init__(path, schema, resume)
+
+    def _open(self) -> None:
+        self._writer = None
+        self._columns: List[Tuple[str, FieldType]] = []
+
+    def _arrow_schema(self, rows: List[Dict[str, Any]]):
+        pa = _pyarrow()
+        types = {
+            FieldType.string: pa.string(),
+            FieldType.number: pa.float64(),
+            FieldType.boolean: pa.bool_(),
+            FieldType.array: pa.list_(pa.string()),
+        }
+        self._columns = schema_columns(self.schema, rows)
+        self._table_schema = pa.schema([(key, types[field_type]) for key, field_type in self._columns])
+        return self._table_schema
+
+    @staticmethod
+    def _value(value: Any, field_type: FieldType) -> Any:
+        if value is None:
+            return None
+        if field_type == FieldType.array:
+            return [_text(item) for item in value] if isinstance(value, list) else [_text(value)]
+        if field_type == FieldType.number:
+            return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        if field_type == FieldType.boolean:
+            return value if isinstance(value, bool) else None
+        return _text(value)
+
+    @abstractmethod
+    def _new_writer(self, arrow_schema):
+        ...
+
+    @abstractmethod
+    def _read_table(self, path: str):
+        ...
+
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        try:
+            return self._read_table(path).to_pylist()
+        except (OSError, _pyarrow().ArrowException) as e:
+            print(f"[Resume] {path} cannot be read ({e}); its rows are lost")
+            return []
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        pa = _pyarrow()
+        if self._writer is None:
+            self._writer = self._new_writer(self._arrow_schema(rows))
+        arrays = {
+            key: [self._value(row.get(key), field_type) for row in rows]
+            for key, field_type in self._columns
+        }
+        self._writer.write_table(pa.Table.from_pydict(arrays, schema=self._table_schema))
+
+    def _close(self) -> None:
+        if self._writer is None:
+            # No rows arrived; still leave a valid, empty file behind.
+            self._writer = self._new_writer(self._arrow_schema([]))
+        self._writer.close()
+
+
+class ParquetDatasetWriter(_ArrowDatasetWriter):
+    """Writes Parquet, compressed with Parquet's own gzip or zstd codec."""
+
+    extension = ".parquet"
+
+    def _new_writer(self, arrow_schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.part_path, arrow_schema, compression=self.compression or "none")
+
+    def _read_table(self, path: str):
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+
+
+class ArrowDatasetWriter(_ArrowDatasetWriter):
+    """Writes an Arrow IPC (Feather v2) file, which only supports zstd compression."""
+
+    extension = ".arrow"
+
+    def __init__(self, path: str, schema: Optional[DatasetSchema] = None, compression: Optional[str] = None,
+                 resume: bool = False):
+        if _normalize_compression(compression) == "gzip":
+            raise ValueError("Arrow files support zstd compression, not gzip.")
+        super().__init__(path, schema, compression, resume)
+
+    def _new_writer(self, arrow_schema):
+        pa = _pyarrow()
+        options = pa.ipc.IpcWriteOptions(compression=self.compression or None)
+        return pa.ipc.new_file(self.part_path, arrow_schema, options=options)
+
+    def _read_table(self, path: str):
+        with _pyarrow().memory_map(path) as source:
+            return _pyarrow().ipc.open_file(source).read_all()
+
+
+DATASET_WRITERS: Dict[str, Callable[..., DatasetWriter]] = {
+    "jsonl": JsonlDatasetWriter,
+    "csv": CsvDatasetWriter,
+    "parquet": ParquetDatasetWriter,
+    "arrow": ArrowDatasetWriter,
+}
+
+
+def _writer_class(output_format: str) -> Callable[..., DatasetWriter]:
+    output_format = (output_format or "jsonl").strip().lower()
+    if output_format not in DATASET_WRITERS:
+        raise ValueError(f"Unknown output format {output_format!r}. Expected one of: {', '.join(DATASET_WRITERS)}.")
+    return DATASET_WRITERS[output_format]
+
+
+def open_dataset_writer(base_path: str, output_format: str = "jsonl", compression: Optional[str] = None,
+                        schema: Optional[DatasetSchema] = None) -> DatasetWriter:
+    """
+    Open a writer for ``base_path`` plus the extension of ``output_format`` and ``compression``.
+
+    ``output_format`` is one of ``DATASET_WRITERS``; ``compression`` is ``"gzip"``,
+    ``"zstd"`` or empty for none. Text formats get a ``.gz`` or ``.zst`` suffix, while Parquet
+    and Arrow compress inside the file.
+    """
+    writer_cls = _writer_class(output_format)
+    compression = _normalize_compression(compression)
+    path = f"{base_path}{writer_cls.extension}"
+    if issubclass(writer_cls, _TextDatasetWriter):
+        path += COMPRESSION_SUFFIXES[compression]
+    return writer_cls(path, schema=schema, compression=compression)
+
+
+def reopen_dataset_writer(path: str, output_format: str = "jsonl", compression: Optional[str] = None,
+                          schema: Optional[DatasetSchema] = None) -> DatasetWriter:
+    """
+    Reopen the dataset an interrupted run was writing to ``path`` (as returned by ``open_dataset_writer``).
+
+    The rows it already holds are carried over into the new file and returned in the
+    writer's ``resumed_rows``, so the caller can tell the rows a resumed run sends again
+    from new ones.
+    """
+    return _writer_class(output_format)(path, schema=schema, compression=compression, resume=True)
@@ -1,8 +1,16 @@
-import json
+import argparse
+import threading
 import uuid
 import os
 from datetime import datetime
-from deep_research_workflow.graph import agent_graph as graph
+from deep_research_workflow.rate_limit import rate_limit_stats
+from deep_research_workflow.runs import save_run, load_run, interrupted_dataset_updates
+from deep_research_workflow.jobs import load_jobs, run_jobs
+from deep_research_workflow.writers import open_dataset_writer, reopen_dataset_writer
+from deep_research_workflow.dedup import RowDeduplicator, filter_section_rows
+from deep_research_workflow.configuration import Configuration
+from deep_research_workflow.metrics import get_run_metrics, save_report
+from deep_research_workflow.tracing import span, tracer
 
 from rich import print
 from rich.console import Console
@@ -90,71 +98,295 @@ def render_section_formatting(section_data, width=100):
         )
         console.print(panel)
 
-def save_json(data, directory="output_files"):
+def render_dedup_report(report):
+    if not any(r["exact_duplicates"] or r["near_duplicates"] for r in report):
+        return
+
+    table = Table(title=None, box=box.ASCII, header_style="bold magenta")
+    table.add_column("Section", style="cyan")
+    table.add_column("Rows", style="green", justify="right")
+    table.add_column("Kept", style="green", justify="right")
+    table.add_column("Exact duplicates", style="yellow", justify="right")
+    table.add_column("Near duplicates", style="yellow", justify="right")
+
+    for r in report:
+        table.add_row(r["section_name"] or "-", str(r["rows"]), str(r["kept"]), str(r["exact_duplicates"]), str(r["near_duplicates"]))
+
+    print_section("ROW DEDUPLICATION")
+    console.print(table)
+
+def metrics_table(first_column, rows, totals):
+    table = Table(title=None, box=box.ASCII, header_style="bold magenta")
+    table.add_column(first_column, style="cyan", no_wrap=True)
+    table.add_column("Calls", style="green", justify="right")
+    table.add_column("Cached", style="green", justify="right")
+    table.add_column("Retries", style="yellow", justify="right")
+    table.add_column("Prompt", style="white", justify="right")
+    table.add_column("Completion", style="white", justify="right")
+    table.add_column("Time (s)", style="white", justify="right")
+    table.add_column("Cost ($)", style="white", justify="right")
+
+    def add_row(name, t, style=None):
+        table.add_row(
+            name, str(t["calls"]), str(t["cached_calls"]), str(t["retries"]), f"{t['prompt_tokens']:,}",
+            f"{t['completion_tokens']:,}", f"{t['seconds']:.2f}", f"{t['cost']:.4f}", style=style,
+        )
+
+    for name, row_totals in rows:
+        add_row(name, row_totals)
+    add_row("TOTAL", totals, style="bold")
+    return table
+
+def render_run_metrics(metrics):
+    by_node = metrics.by_node()
+    if not by_node:
+        return
+
+    print_section("RUN METRICS")
+    console.print(metrics_table("Node", sorted(by_node.items(), key=lambda item: -item[1]["seconds"]), metrics.totals()))
+
+    # Schema and outline calls belong to no section, so this total only covers the sections.
+    by_section = metrics.by_section()
+    if by_section:
+        section_totals = {field: sum(t[field] for t in by_section.values()) for field in metrics.totals()}
+        console.print(metrics_table("Section", by_section.items(), section_totals))
+
+def render_rate_limit_stats():
+    stats = [s for s in rate_limit_stats() if s["calls"]]
+    if not stats:
+        return
+
+    table = Table(title=None, box=box.ASCII, header_style="bold magenta")
+    table.add_column("Limiter", style="cyan", no_wrap=True)
+    table.add_column("Calls", style="green", justify="right")
+    table.add_column("Delayed", style="yellow", justify="right")
+    table.add_column("Waited (s)", style="white", justify="right")
+
+    for s in stats:
+        table.add_row(s["name"], str(s["calls"]), str(s["waited_calls"]), f"{s['waited_seconds']:.2f}")
+
+    print_section("RATE LIMITING")
+    console.print(table)
+
+def render_provider_health():
+    from deep_research_workflow.failover import provider_health_stats
+    stats = provider_health_stats()
+    if not stats:
+        return
+
+    table = Table(title=None, box=box.ASCII, header_style="bold magenta")
+    table.add_column("Model", style="cyan", no_wrap=True)
+    table.add_column("Wins", style="green", justify="right")
+    table.add_column("Failures", style="red", justify="right")
+    table.add_column("Hedged", style="yellow", justify="right")
+    table.add_column("Latency (s)", style="white", justify="right")
+    table.add_column("Status", style="white")
+
+    for s in stats:
+        status = "ok" if s["available"] else "cooling down"
+        table.add_row(s["name"], str(s["wins"]), str(s["failures"]), str(s["hedges"]), f"{s['latency_seconds']:.2f}", status)
+
+    print_section("PROVIDER FAILOVER")
+    console.print(table)
+
+def load_graph():
+    # The graph pulls in LangGraph and the node modules, so it is imported after the banner.
+    from deep_research_workflow.graph import agent_graph
+    return agent_graph
+
+def create_dataset_writer(configuration, directory="output_files", schema=None):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"final_dataset_output_{timestamp}.json"
-    os.makedirs(directory, exist_ok=True)
-    filepath = os.path.join(directory, filename)
+    base_path = os.path.join(directory, f"final_dataset_output_{timestamp}")
+    return open_dataset_writer(base_path, configuration.output_format, configuration.output_compression, schema=schema)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI-powered Deep Research & Dataset Engine")
+    parser.add_argument("--resume", metavar="THREAD_ID", help="resume an interrupted or failed run from its last checkpoint")
+    parser.add_argument("--jobs", metavar="JOBS_JSONL", help="run the jobs in a JSONL file headlessly instead of prompting")
+    parser.add_argument("--workers", type=int, default=2, help="number of jobs to run at once with --jobs (default: 2)")
+    parser.add_argument("--output-dir", default="output_files", help="directory for datasets and manifests (default: output_files)")
+    parser.add_argument("--trace", metavar="TRACE_JSON", default=os.environ.get("TRACE_PATH"), help="record a Chrome trace of the run (open it in chrome://tracing or Perfetto)")
+    return parser.parse_args()
+
+def run_headless(args):
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return
+
+    console.print(f"[green]Running {len(jobs)} job(s) with {args.workers} worker(s)[/green]")
+
+    def report(entry):
+        if entry["status"] == "completed":
+            console.print(f"[green]✔ {entry['id']}[/green] {entry['rows']} rows in {entry['seconds']}s -> {entry['output']}")
+        else:
+            console.print(f"[red]✘ {entry['id']}[/red] {entry['error']} (resume with: python main.py --resume {entry['thread_id']})")
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    manifest = run_jobs(load_graph(), jobs, output_dir=args.output_dir, max_workers=args.workers, on_complete=report)
+    completed = sum(1 for entry in manifest["jobs"] if entry["status"] == "completed")
+    console.print(f"[green]{completed}/{len(jobs)} job(s) completed. Manifest saved to:[/green] {manifest['path']}")
+    render_rate_limit_stats()
+    render_provider_health()
+    export_trace()
 
-    console.print(f"[green]Saved final dataset to:[/green] {filepath}")
+def export_trace():
+    path = tracer.export()
+    if path:
+        console.print(f"[green]Saved trace to:[/green] {path}")
 
 def main():
+    args = parse_args()
     render_banner("Thesius.ai", "AI-powered Deep Research & Dataset Engine")
+    if args.trace:
+        tracer.enable(args.trace)
+    # Import the graph in the background while the user is typing.
+    threading.Thread(target=load_graph, daemon=True).start()
 
-    topic = Prompt.ask("[bold yellow]Enter your topic[/bold yellow]").strip()
-    outline = Prompt.ask("[bold yellow]Enter your outline or goal[/bold yellow]").strip()
-
-    if not topic or not outline:
-        console.print("[bold red]Error:[/bold red] Topic and outline cannot be empty.")
+    if args.jobs:
+        run_headless(args)
         return
 
-    thread = {
-        "configurable": {
-            "thread_id": str(uuid.uuid4()),
+    if args.resume:
+        try:
+            run = load_run(args.resume)
+        except FileNotFoundError as e:
+            console.print(f"[bold red]Error:[/bold red] {e}")
+            return
+
+        thread = {"configurable": run["configurable"]}
+        graph = load_graph()
+        snapshot = graph.get_state(thread)
+        interrupted_updates = interrupted_dataset_updates(snapshot)
+        if not snapshot.next and not interrupted_updates:
+            console.print(f"[bold red]Error:[/bold red] Run {args.resume} has nothing left to resume.")
+            return
+
+        topic, outline = run["topic"], run["outline"]
+        graph_input = None
+        console.print(f"[green]Resuming run[/green] {args.resume}")
+    else:
+        topic = Prompt.ask("[bold yellow]Enter your topic[/bold yellow]").strip()
+        outline = Prompt.ask("[bold yellow]Enter your outline or goal[/bold yellow]").strip()
+
+        if not topic or not outline:
+            console.print("[bold red]Error:[/bold red] Topic and outline cannot be empty.")
+            return
+
+        defaults = {
             "max_queries": 2,
             "search_depth": 1,
             "num_reflections": 2,
             "max_rows_from_each_section": 5
         }
-    }
+        # These are the CLI's defaults, not choices made for this run, so environment
+        # variables still override them.
+        thread = {
+            "configurable": {
+                "thread_id": str(uuid.uuid4()),
+                **{name: value for name, value in defaults.items() if name.upper() not in os.environ},
+            }
+        }
+        graph_input = {"topic": topic, "outline": outline}
+        run = {"topic": topic, "outline": outline, "configurable": thread["configurable"]}
+        save_run(thread["configurable"]["thread_id"], run)
+
+    thread_id = thread["configurable"]["thread_id"]
+    console.print(Panel.fit(f"[bold]Topic:[/bold] {topic}\n[bold]Outline:[/bold] {outline}\n[bold]Run:[/bold] {thread_id}", title=None, border_style="cyan"))
+
+    graph = load_graph()
+    configuration = Configuration.from_runnable_config(thread)
+    # A resumed run already has its schema; a new one gets it from the schema generator.
+    schema = snapshot.values.get("schema") if args.resume else None
+    output = run.get("output") if args.resume else None
+    try:
+        if output:
+            # A resumed run carries on in the file it was writing, after the rows already in it.
+            writer = reopen_dataset_writer(output["path"], output["format"], output["compression"], schema)
+        else:
+            writer = create_dataset_writer(configuration, args.output_dir, schema)
+            output = {"path": writer.path, "format": configuration.output_format, "compression": configuration.output_compression}
+            save_run(thread_id, {**run, "output": output})
+    except (ImportError, ValueError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return
+    deduplicator = RowDeduplicator(near_duplicates=configuration.dedup_rows_near) if configuration.dedup_rows else None
+    if args.resume:
+        # Nodes that finished before the interruption send their rows again, so a resumed run
+        # always drops rows it has already written, even with dedup_rows off.
+        deduplicator = deduplicator or RowDeduplicator()
+        deduplicator.seed(writer.resumed_rows)
+        for update in interrupted_updates:
+            writer.write_rows(filter_section_rows(update, deduplicator))
+        console.print(f"[green]Continuing[/green] {writer.path} [green]with {writer.rows_written} rows[/green]")
+    try:
+        with span("run", run=thread_id, section=""):
+            for event in graph.stream(
+                graph_input,
+                config=thread,
+            ):
+                if not any(event.values()):
+                    # A node with nothing to do, such as batch_dataset_generator outside batch mode.
+                    continue
 
-    console.print(Panel.fit(f"[bold]Topic:[/bold] {topic}\n[bold]Outline:[/bold] {outline}", title=None, border_style="cyan"))
+                if "schema_generator" in event:
+                    writer.schema = event["schema_generator"]["schema"]
+                    render_schema(event["schema_generator"]["schema"])
 
-    try:
-        for event in graph.stream(
-            {"topic": topic, "outline": outline},
-            config=thread,
-        ):
-            if "schema_generator" in event:
-                render_schema(event["schema_generator"]["schema"])
+                elif "report_structure_planner" in event:
+                    print_section("REPORT STRUCTURE PLAN", event["report_structure_planner"]["messages"][-1].content)
 
-            elif "report_structure_planner" in event:
-                print_section("REPORT STRUCTURE PLAN", event["report_structure_planner"]["messages"][-1].content)
+                elif "section_formatter" in event:
+                    render_section_formatting(event["section_formatter"])
 
-            elif "section_formatter" in event:
-                render_section_formatting(event["section_formatter"])
+                elif "research_agent" in event and event["research_agent"].get("batch_requests"):
+                    console.print(Panel.fit("section research done — dataset generation queued for the batch job", title="RESEARCH AND SECTION-WISE DATASET GENERATION", border_style="green", width=100))
 
-            elif "research_agent" in event:
-                console.print(Panel.fit(f"section dataset generation started — total rows: {len(event['research_agent']['final_section_dataset'])}", title="RESEARCH AND SECTION-WISE DATASET GENERATION", border_style="green", width=100))
+                elif "research_agent" in event:
+                    written = writer.write_rows(filter_section_rows(event["research_agent"], deduplicator))
+                    console.print(Panel.fit(f"section dataset written — rows: {written}, total rows so far: {writer.rows_written}", title="RESEARCH AND SECTION-WISE DATASET GENERATION", border_style="green", width=100))
 
-            elif "final_dataset_aggregator" in event:
-                print_section("FINAL DATASET AGGREGATION")
-                save_json(event["final_dataset_aggregator"])
+                elif "batch_dataset_generator" in event:
+                    written = writer.write_rows(filter_section_rows(event["batch_dataset_generator"], deduplicator))
+                    console.print(Panel.fit(f"batch dataset written — rows: {written}, total rows so far: {writer.rows_written}", title="BATCH DATASET GENERATION", border_style="green", width=100))
+
+                elif "final_dataset_aggregator" in event:
+                    print_section("FINAL DATASET AGGREGATION")
+                    console.print(f"[green]Saved final dataset ({writer.rows_written} rows) to:[/green] {writer.close()}")
 
-            elif "human_feedback_on_schema" in event:
-                print_section("YOUR FEEDBACK ON SCHEMA", event["human_feedback_on_schema"]["messages"][-1].content)
+                elif "human_feedback_on_schema" in event:
+                    print_section("YOUR FEEDBACK ON SCHEMA", event["human_feedback_on_schema"]["messages"][-1].content)
 
-            elif "human_feedback_report_structure" in event:
-                print_section("YOUR FEEDBACK ON REPORT STRUCTURE", event["human_feedback_report_structure"]["messages"][-1].content)
+                elif "human_feedback_report_structure" in event:
+                    print_section("YOUR FEEDBACK ON REPORT STRUCTURE", event["human_feedback_report_structure"]["messages"][-1].content)
 
-            else:
-                console.print("[dim]Waiting for next event...[/dim]")
+                else:
+                    console.print("[dim]Waiting for next event...[/dim]")
+
+            if not writer.closed:
+                # A resumed run whose last step had already finished has no aggregator update.
+                print_section("FINAL DATASET AGGREGATION")
+                console.print(f"[green]Saved final dataset ({writer.rows_written} rows) to:[/green] {writer.close()}")
 
     except KeyboardInterrupt:
         console.print("\n[bold red]Execution stopped by user.[/bold red]")
+        console.print(f"[yellow]Rows written so far:[/yellow] {writer.abort()}")
+        console.print(f"[yellow]Resume with:[/yellow] python main.py --resume {thread_id}")
+
+    except Exception as e:
+        console.print(f"\n[bold red]Run failed:[/bold red] {e}")
+        console.print(f"[yellow]Rows written so far:[/yellow] {writer.abort()}")
+        console.print(f"[yellow]Resume with:[/yellow] python main.py --resume {thread_id}")
+
+    if deduplicator is not None:
+        render_dedup_report(deduplicator.report())
+    metrics = get_run_metrics(thread_id)
+    render_run_metrics(metrics)
+    render_rate_limit_stats()
+    render_provider_health()
+    report_path = save_report(metrics, f"{writer.base_path}.report.json")
+    console.print(f"[green]Saved run report to:[/green] {report_path}")
+    export_trace()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file